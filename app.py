@@ -1,32 +1,487 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 import numpy as np
-import joblib
 import os
 from datetime import datetime
 import io
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
+import json
+import hashlib
+import hmac
+import copy
+import contextlib
+import uuid
+import shutil
+import socket
+import tempfile
+import queue
+import zipfile
+import threading
+import time
+from collections import OrderedDict
+from bisect import bisect_left
+from concurrent.futures import Future, ProcessPoolExecutor
 import warnings
+from src.forest import FlatForest
+from src.hashing import file_sha256
+from src.validation import (FEATURES, FLAG_FEATURES, FLAG_TRUE_VALUES, INTEGER_FEATURES, LAB_PRECISION,
+                            RANGE_CHECKS, validate_array)
 warnings.filterwarnings('ignore')
 
 app = Flask(__name__)
 
 MODEL_PATH = os.environ.get('MODEL_PATH', 'final/ckd_model.pkl')
+MODEL_ARTIFACT_PATH = os.environ.get('MODEL_ARTIFACT_PATH', 'final/ckd_forest')
 FEATURE_NAMES = os.environ.get('FEATURE_NAMES', 'sc,hemo,al,sg,pcv,rbcc,dm,htn').split(',')
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '50000'))
+MICROBATCH_ENABLED = os.environ.get('MICROBATCH_ENABLED', '0').lower() in ['1', 'true', 'yes']
+MICROBATCH_WINDOW_MS = float(os.environ.get('MICROBATCH_WINDOW_MS', '2'))
+MICROBATCH_MAX_ROWS = int(os.environ.get('MICROBATCH_MAX_ROWS', '64'))
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', '10000'))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', '3600'))
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', '256'))
+REPORT_CACHE_TTL = float(os.environ.get('REPORT_CACHE_TTL', '86400'))
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', '')
+REPORT_CACHE_DIR_MAX_FILES = int(os.environ.get('REPORT_CACHE_DIR_MAX_FILES', '10000'))
+REPORT_CACHE_DIR_MAX_MB = float(os.environ.get('REPORT_CACHE_DIR_MAX_MB', '512'))
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', '2'))
+REPORT_JOB_TTL = float(os.environ.get('REPORT_JOB_TTL', '3600'))
+REPORT_JOB_STALL_TIMEOUT = float(os.environ.get('REPORT_JOB_STALL_TIMEOUT', '120'))
+REPORT_JOB_DIR = os.environ.get('REPORT_JOB_DIR', os.path.join(tempfile.gettempdir(), 'ckd-report-jobs'))
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', '')
+MODEL_POLL_INTERVAL = float(os.environ.get('MODEL_POLL_INTERVAL', '30'))
+MODEL_MIN_ACCURACY = float(os.environ.get('MODEL_MIN_ACCURACY', '0.75'))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+SHADOW_MODEL_PATH = os.environ.get('SHADOW_MODEL_PATH', '')
+SHADOW_WORKERS = int(os.environ.get('SHADOW_WORKERS', '1'))
+SHADOW_QUEUE_SIZE = int(os.environ.get('SHADOW_QUEUE_SIZE', '1000'))
+SHADOW_LOG_EVERY = int(os.environ.get('SHADOW_LOG_EVERY', '1000'))
+ATTRIBUTIONS_ENABLED = os.environ.get('ATTRIBUTIONS_ENABLED', '1').lower() in ['1', 'true', 'yes']
+
+# Latency histogram bucket bounds, in seconds
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Metrics:
+    """In-process per-stage latency histograms and counters, rendered for Prometheus
+
+    Request handlers chain stage timings: t = metrics.stage('predict', 'parse', t)
+    records the time since t and returns the current time for the next stage.
+    Values are per worker process.
+
+    Each thread records into its own shard, so the hot path takes no lock;
+    the lock is only held to add a new series and at scrape time, when the
+    shards are merged.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []  # (thread, histograms, counters) per recording thread
+        self._retired = ({}, {})  # Shards of finished threads, folded in at scrape time
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        # This thread's (histograms, counters): (endpoint, stage) -> bucket counts
+        # followed by the running sum, and (name, sorted label items) -> value
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = ({}, {})
+            with self._lock:
+                self._shards.append((threading.current_thread(), *shard))
+            return shard
+
+    def stage(self, endpoint, stage, start):
+        """Record the time since start for one stage; returns the current time"""
+        now = time.perf_counter()
+        elapsed = now - start
+        histograms = self._shard()[0]
+        key = (endpoint, stage)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # New keys are added under the lock so a scrape never iterates a resizing dict
+            with self._lock:
+                histogram = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect_left(self.buckets, elapsed)] += 1
+        histogram[-1] += elapsed
+        return now
+
+    def inc(self, name, amount=1, help='', **labels):
+        """Increase a counter"""
+        counters = self._shard()[1]
+        key = (name, tuple(sorted(labels.items())))
+        if key in counters:
+            counters[key] += amount
+            return
+        with self._lock:
+            counters[key] = amount
+            if help:
+                self._help.setdefault(name, help)
+
+    @staticmethod
+    def _merge(histograms, counters, into):
+        for key, values in histograms.items():
+            merged = into[0].setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                merged[i] += value
+        for key, value in counters.items():
+            into[1][key] = into[1].get(key, 0) + value
+
+    def _snapshot(self):
+        # Merge every thread's shard, retiring the shards of threads that have exited
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if shard[0].is_alive():
+                    live.append(shard)
+                else:
+                    self._merge(shard[1], shard[2], self._retired)
+            self._shards = live
+            merged = ({}, {})
+            self._merge(*self._retired, merged)
+            for _, histograms, counters in live:
+                self._merge(histograms, counters, merged)
+            return merged[0], merged[1], dict(self._help)
+
+    @staticmethod
+    def _labels(items):
+        return ','.join(f'{key}="{value}"' for key, value in items)
+
+    def render(self, extra=()):
+        """Prometheus text exposition of all metrics
+
+        extra holds (name, type, help, [(labels, value), ...]) series read from
+        elsewhere at scrape time, such as cache statistics.
+        """
+        histograms, counters, help_text = self._snapshot()
+
+        lines = ['# HELP ckd_stage_duration_seconds Time spent in each stage of a request',
+                 '# TYPE ckd_stage_duration_seconds histogram']
+        for (endpoint, stage), values in sorted(histograms.items()):
+            labels = self._labels([('endpoint', endpoint), ('stage', stage)])
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'ckd_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += values[len(self.buckets)]
+            lines.append(f'ckd_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'ckd_stage_duration_seconds_sum{{{labels}}} {values[-1]}')
+            lines.append(f'ckd_stage_duration_seconds_count{{{labels}}} {cumulative}')
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# HELP {name} {help_text.get(name, name)}')
+            lines.append(f'# TYPE {name} counter')
+            for (counter, items), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f'{name}{{{self._labels(items)}}} {value}' if items else f'{name} {value}')
+
+        for name, kind, help, samples in extra:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                items = sorted(labels.items())
+                lines.append(f'{name}{{{self._labels(items)}}} {value}' if items else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+# Load the memory-mapped forest artifact if present: pages are shared between
+# worker processes and nothing is unpickled, so startup is close to instant
+model = None
+forest = None
+if os.path.exists(os.path.join(MODEL_ARTIFACT_PATH, 'manifest.json')):
+    try:
+        forest = FlatForest.load_mmap(MODEL_ARTIFACT_PATH)
+        if os.path.exists(MODEL_PATH) and forest.source_sha256 != file_sha256(MODEL_PATH):
+            print("Warning: Model artifact was exported from a different model. Loading the model file instead.")
+            forest = None
+        else:
+            model = forest
+            print("Memory-mapped model artifact loaded successfully!")
+    except Exception as e:
+        print(f"Error loading model artifact: {e}")
+        forest = None
 
 # Load trained model
-try:
-    model = joblib.load(MODEL_PATH)
-    print("Model loaded successfully!")
-except FileNotFoundError:
-    print("Warning: Model file not found. Using fallback prediction method.")
-    model = None
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+if model is None:
+    try:
+        import joblib  # Only needed when the memory-mapped artifact is unavailable
+        model = joblib.load(MODEL_PATH)
+        print("Model loaded successfully!")
+    except FileNotFoundError:
+        print("Warning: Model file not found. Using fallback prediction method.")
+        model = None
+    except Exception as e:
+        print(f"Error loading model: {e}")
+        model = None
+
+# Identify the loaded model so cached results are never served across model changes
+if forest is not None:
+    model_version = forest.source_sha256
+else:
+    model_version = file_sha256(MODEL_PATH) if model is not None else 'rules'
+
+# The scorer and its version, published together so a request can read both in one step
+active_model = (model, forest, model_version)
+
+# Build the attribution tables at load time, so the first explained request does not pay for them
+if forest is not None and ATTRIBUTIONS_ENABLED:
+    forest.build_attributions()
+
+def set_active_model(new_model, new_forest, new_version):
+    """Switch the model used by new requests
+
+    Scoring reads (model, forest, version) from active_model in one step and
+    tags its results with that version, so cached results are never stored or
+    served across versions. Requests already running finish on the model they
+    started with.
+    """
+    global model, forest, model_version, active_model
+    active_model = (new_model, new_forest, new_version)
+    forest = new_forest
+    model = new_model
+    model_version = new_version
+
+class ModelRegistry:
+    """Versioned model artifacts in a directory, polled and hot-swapped in the background
+
+    Each version is a subdirectory written by FlatForest.save_mmap() (see
+    src/train.py --publish), optionally with a holdout.npz sample. Versions sort
+    by name, newest last. A PINNED file naming a version overrides "newest", so a
+    rollback made through one worker reaches every worker on its next poll.
+    Candidates are memory-mapped, warmed up and validated before being swapped in.
+    A version that fails validation is skipped until its files change.
+    """
+
+    def __init__(self, directory, poll_interval=30.0, min_accuracy=0.75):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.min_accuracy = min_accuracy
+        self.active = None        # Name of the active registry version, None before the first swap
+        self.history = []         # Previously active names, most recent last
+        self.rejected = {}        # name -> (manifest mtime, reason)
+        self.last_poll = None
+        self.last_error = None
+        self._loaded = {}         # name -> FlatForest, kept mapped for instant rollback
+        self._lock = threading.Lock()
+        self._poller = None
+        self._poller_pid = None
+        self._poller_lock = threading.Lock()  # Separate from _lock, which is held while loading
+
+    def versions(self):
+        """Names of complete versions, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(name for name in names
+                      if not name.startswith('.') and os.path.exists(os.path.join(self.directory, name, 'manifest.json')))
+
+    def pinned(self):
+        """The pinned version name, or None to follow the newest version"""
+        try:
+            with open(os.path.join(self.directory, 'PINNED')) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def pin(self, name):
+        """Pin a version for every worker, or unpin with None"""
+        path = os.path.join(self.directory, 'PINNED')
+        if name is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = path + f'.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(name)
+        os.replace(tmp_path, path)
+
+    def _rejected(self, name):
+        # True when this version already failed validation and its files have not changed since
+        rejected = self.rejected.get(name)
+        if rejected is None:
+            return False
+        try:
+            return rejected[0] == os.path.getmtime(os.path.join(self.directory, name, 'manifest.json'))
+        except OSError:
+            return True
+
+    def _load(self, name):
+        # Map, warm up and validate one version; raises ValueError when it is unfit to serve
+        path = os.path.join(self.directory, name)
+        candidate = FlatForest.load_mmap(path)
+        if candidate.n_features_in_ != len(FEATURE_NAMES):
+            raise ValueError(f"expects {candidate.n_features_in_} features, not {len(FEATURE_NAMES)}")
+        if candidate.feature_names is not None and list(candidate.feature_names) != FEATURE_NAMES:
+            raise ValueError(f"feature order {list(candidate.feature_names)} does not match FEATURE_NAMES")
+
+        # Warm both traversal paths, which also pages in the arrays
+        holdout_path = os.path.join(path, 'holdout.npz')
+        if os.path.exists(holdout_path):
+            with np.load(holdout_path, allow_pickle=False) as holdout:
+                X, y = holdout['X'], holdout['y']
+        else:
+            X, y = np.array([[1.2, 15.4, 1, 1.020, 44, 5.2, 0, 0], [4.5, 9.0, 3, 1.010, 28, 3.1, 1, 1]]), None
+        proba = candidate.predict_proba(X)
+        single = candidate.predict_proba(X[0])
+        if not np.isfinite(proba).all() or not np.allclose(proba.sum(axis=1), 1.0):
+            raise ValueError("returned invalid probabilities")
+        if not np.allclose(single[0], proba[0]):
+            raise ValueError("single-row and batch scoring disagree")
+        if ATTRIBUTIONS_ENABLED:
+            # Build the attribution tables before the swap, so requests never pay for them
+            candidate.build_attributions()
+            candidate.explain(X[:2])
+
+        # Held-out accuracy, when the version ships a sample
+        if y is not None:
+            accuracy = float((candidate.classes_[proba.argmax(axis=1)] == y).mean())
+            if accuracy < self.min_accuracy:
+                raise ValueError(f"held-out accuracy {accuracy:.3f} is below {self.min_accuracy:.3f}")
+        return candidate
+
+    def activate(self, name):
+        """Load (if needed), validate and swap in a version; raises ValueError on failure"""
+        with self._lock:
+            if name == self.active:
+                return
+            candidate = self._loaded.get(name)
+            if candidate is None:
+                manifest_path = os.path.join(self.directory, name, 'manifest.json')
+                if not os.path.exists(manifest_path):
+                    raise ValueError(f"Unknown model version: {name}")
+                mtime = os.path.getmtime(manifest_path)
+                try:
+                    candidate = self._load(name)
+                except Exception as e:
+                    self.rejected[name] = (mtime, str(e))
+                    metrics.inc('ckd_model_reloads_total', help='Model version swaps, by result', result='rejected')
+                    raise ValueError(f"Model version {name} rejected: {e}")
+                self.rejected.pop(name, None)
+                self._loaded[name] = candidate
+
+            set_active_model(candidate, candidate, candidate.source_sha256 or name)
+            if self.active is not None:
+                self.history.append(self.active)
+            self.active = name
+            metrics.inc('ckd_model_reloads_total', help='Model version swaps, by result', result='activated')
+            print(f"Model version {name} activated")
+
+            # Keep the active version and the last few rollback targets mapped
+            keep = {name, *self.history[-3:]}
+            for loaded in list(self._loaded):
+                if loaded not in keep:
+                    del self._loaded[loaded]
+
+    def rollback(self, name=None):
+        """Pin and activate name, or else the previously active version (or else the next older one)
+
+        Without a name, candidates are tried in that order until one activates.
+        Before the first swap every registry version counts as older.
+        """
+        if name is not None:
+            self.activate(name)
+            self.pin(name)
+            return name
+
+        previous = [version for version in reversed(self.history) if version != self.active]
+        previous += [version for version in reversed(self.versions())
+                     if (self.active is None or version < self.active)
+                     and version not in previous and not self._rejected(version)]
+        if not previous:
+            raise ValueError("No previous model version to roll back to")
+        error = None
+        for name in previous:
+            try:
+                self.activate(name)
+            except ValueError as e:
+                error = e
+                continue
+            self.pin(name)
+            return name
+        raise error
+
+    def poll(self):
+        """Activate the pinned version, or else the newest version that passes validation
+
+        Unpinned, versions newer than the active one are tried newest first, so
+        one bad publish falls back to the next newest instead of blocking updates.
+        """
+        self.last_poll = time.time()
+        versions = [name for name in self.versions() if not self._rejected(name)]
+        pinned = self.pinned()
+        if pinned is not None:
+            candidates = [pinned] if pinned in versions else []
+        else:
+            candidates = [name for name in reversed(versions) if self.active is None or name > self.active]
+        if not candidates or candidates[0] == self.active:
+            return
+        errors = []
+        for name in candidates:
+            try:
+                self.activate(name)
+            except ValueError as e:
+                errors.append(str(e))
+                print(e)
+                continue
+            break
+        self.last_error = '; '.join(errors) or None
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Model registry poll error: {e}")
+
+    def ensure_poller(self):
+        # Start polling lazily, and again after a fork (e.g. gunicorn --preload). The
+        # check is repeated under the lock so concurrent first requests start one poller.
+        if self._poller_pid == os.getpid() and self._poller.is_alive():
+            return
+        with self._poller_lock:
+            if self._poller_pid != os.getpid() or not self._poller.is_alive():
+                self._poller_pid = os.getpid()
+                self._poller = threading.Thread(target=self._run, name='model-registry', daemon=True)
+                self._poller.start()
+
+    def status(self):
+        """Active version and registry state for the admin endpoint"""
+        return {
+            'active': self.active,
+            'model_version': model_version,
+            'pinned': self.pinned(),
+            'available': self.versions(),
+            'loaded': sorted(self._loaded),
+            'history': list(self.history),
+            'rejected': {name: reason for name, (_, reason) in self.rejected.items()},
+            'last_poll': datetime.fromtimestamp(self.last_poll).isoformat() if self.last_poll else None,
+            'last_error': self.last_error,
+            'poll_interval_seconds': self.poll_interval,
+        }
+
+# Model registry for hot reloads (enable with MODEL_REGISTRY_DIR); the first poll runs
+# at startup, so the newest valid version replaces the model loaded above
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR, MODEL_POLL_INTERVAL, MODEL_MIN_ACCURACY) if MODEL_REGISTRY_DIR else None
+if model_registry is not None:
+    model_registry.poll()
+
+# Risk factor bit flags used by the vectorized rule engine
+RISK_SC_HIGH = 1 << 0
+RISK_HEMO_LOW = 1 << 1
+RISK_SG_ABNORMAL = 1 << 2
+RISK_PCV_LOW = 1 << 3
+RISK_RBCC_LOW = 1 << 4
+RISK_ALBUMIN_HIGH = 1 << 5
+RISK_DIABETES = 1 << 6
+RISK_HYPERTENSION = 1 << 7
+
+# Risk categories, indexed by the category codes returned from predict_batch
+RISK_CATEGORIES = ["Low Risk", "Moderate Risk", "High Risk"]
+CATEGORY_LOW, CATEGORY_MODERATE, CATEGORY_HIGH = 0, 1, 2
 
 class CKDPredictor:
     def __init__(self):
@@ -51,101 +506,140 @@ class CKDPredictor:
             'diabetes': 0.15,     # Diabetes mellitus
             'hypertension': 0.10  # Hypertension
         }
+        
+        self.albumin_levels = ["Trace", "1+", "2+", "3+", "4+", "5+"]
+        
+        # Risk factor labels in reporting order (albumin is labelled per level)
+        self.risk_labels = [
+            (RISK_SC_HIGH, "Elevated Serum Creatinine"),
+            (RISK_HEMO_LOW, "Low Hemoglobin (Anemia)"),
+            (RISK_SG_ABNORMAL, "Abnormal Urine Specific Gravity"),
+            (RISK_PCV_LOW, "Low Packed Cell Volume"),
+            (RISK_RBCC_LOW, "Low Red Blood Cell Count"),
+            (RISK_ALBUMIN_HIGH, None),
+            (RISK_DIABETES, "Diabetes Mellitus"),
+            (RISK_HYPERTENSION, "Hypertension"),
+        ]
     
-    def extract_risk_factors(self, data):
-        """Extract risk factors from patient data"""
-        risk_factors = []
-        risk_score = 0.0
+    def score_batch(self, X):
+        """Compute risk scores and risk factor bitmasks for an (N, 8) array
         
-        # Convert inputs to appropriate types
-        sc = float(data[0])    # Serum Creatinine
-        hemo = float(data[1])  # Hemoglobin
-        al = int(data[2])      # Albumin Level
-        sg = float(data[3])    # Specific Gravity
-        pcv = float(data[4])   # Packed Cell Volume
-        rbcc = float(data[5])  # Red Blood Cell Count
-        dm = int(data[6])      # Diabetes Mellitus
-        htn = int(data[7])     # Hypertension
+        Scores are accumulated in the same order as the original per-row checks,
+        so they are bit-for-bit identical to scoring each row on its own.
+        """
+        X = np.asarray(X, dtype=float).reshape(-1, 8)
+        sc, hemo, sg, pcv, rbcc = X[:, 0], X[:, 1], X[:, 3], X[:, 4], X[:, 5]
+        al = X[:, 2].astype(np.int64)    # Albumin Level (truncated like int())
+        dm = X[:, 6].astype(np.int64)    # Diabetes Mellitus
+        htn = X[:, 7].astype(np.int64)   # Hypertension
+        w = self.risk_weights
         
         # Check serum creatinine (high indicates kidney dysfunction)
-        if sc > self.normal_ranges['sc'][1]:
-            risk_factors.append("Elevated Serum Creatinine")
-            if sc > 3.0:
-                risk_score += self.risk_weights['sc_high'] * 2
-            else:
-                risk_score += self.risk_weights['sc_high']
-        
+        sc_high = sc > self.normal_ranges['sc'][1]
         # Check hemoglobin (low indicates anemia)
-        if hemo < self.normal_ranges['hemo'][0]:
-            risk_factors.append("Low Hemoglobin (Anemia)")
-            risk_score += self.risk_weights['hemo_low']
-        
+        hemo_low = hemo < self.normal_ranges['hemo'][0]
         # Check specific gravity
-        if sg < self.normal_ranges['sg'][0] or sg > self.normal_ranges['sg'][1]:
-            risk_factors.append("Abnormal Urine Specific Gravity")
-            risk_score += self.risk_weights['sg_abnormal']
-        
+        sg_abnormal = (sg < self.normal_ranges['sg'][0]) | (sg > self.normal_ranges['sg'][1])
         # Check packed cell volume
-        if pcv < self.normal_ranges['pcv'][0]:
-            risk_factors.append("Low Packed Cell Volume")
-            risk_score += self.risk_weights['pcv_low']
-        
+        pcv_low = pcv < self.normal_ranges['pcv'][0]
         # Check red blood cell count
-        if rbcc < self.normal_ranges['rbcc'][0]:
-            risk_factors.append("Low Red Blood Cell Count")
-            risk_score += self.risk_weights['rbcc_low']
-        
+        rbcc_low = rbcc < self.normal_ranges['rbcc'][0]
         # Check albumin level
-        if al > 0:
-            albumin_levels = ["Trace", "1+", "2+", "3+", "4+", "5+"]
-            if al <= len(albumin_levels):
-                risk_factors.append(f"Proteinuria ({albumin_levels[al-1]})")
-                risk_score += self.risk_weights['albumin_high'] * (al / 5.0)
+        albumin_high = (al > 0) & (al <= len(self.albumin_levels))
+        # Check diabetes mellitus and hypertension
+        diabetes = dm == 1
+        hypertension = htn == 1
         
-        # Check diabetes mellitus
-        if dm == 1:
-            risk_factors.append("Diabetes Mellitus")
-            risk_score += self.risk_weights['diabetes']
+        risk_scores = np.zeros(len(X))
+        risk_scores += np.where(sc_high, np.where(sc > 3.0, w['sc_high'] * 2, w['sc_high']), 0.0)
+        risk_scores += np.where(hemo_low, w['hemo_low'], 0.0)
+        risk_scores += np.where(sg_abnormal, w['sg_abnormal'], 0.0)
+        risk_scores += np.where(pcv_low, w['pcv_low'], 0.0)
+        risk_scores += np.where(rbcc_low, w['rbcc_low'], 0.0)
+        risk_scores += np.where(albumin_high, w['albumin_high'] * (al / 5.0), 0.0)
+        risk_scores += np.where(diabetes, w['diabetes'], 0.0)
+        risk_scores += np.where(hypertension, w['hypertension'], 0.0)
         
-        # Check hypertension
-        if htn == 1:
-            risk_factors.append("Hypertension")
-            risk_score += self.risk_weights['hypertension']
+        risk_masks = (sc_high * RISK_SC_HIGH
+                      | hemo_low * RISK_HEMO_LOW
+                      | sg_abnormal * RISK_SG_ABNORMAL
+                      | pcv_low * RISK_PCV_LOW
+                      | rbcc_low * RISK_RBCC_LOW
+                      | albumin_high * RISK_ALBUMIN_HIGH
+                      | diabetes * RISK_DIABETES
+                      | hypertension * RISK_HYPERTENSION)
         
-        return risk_factors, risk_score
+        return risk_scores, risk_masks
     
-    def predict_fallback(self, input_data):
-        """Fallback prediction when model is not available"""
-        risk_factors, risk_score = self.extract_risk_factors(input_data[0])
+    def predict_batch(self, X):
+        """Rule-based predictions for an (N, 8) array
+        
+        Returns (categories, probabilities, risk_masks) arrays; categories index RISK_CATEGORIES.
+        """
+        X = np.asarray(X, dtype=float).reshape(-1, 8)
+        risk_scores, risk_masks = self.score_batch(X)
         
         # Calculate probability
-        probability = min(risk_score * 100 / 1.3, 95)
+        probabilities = np.minimum(risk_scores * 100 / 1.3, 95)
         
         # Determine prediction
-        if probability >= 60:
-            prediction = "High Risk"
-            confidence = "High"
-        elif probability >= 30:
-            prediction = "Moderate Risk" 
-            confidence = "Medium"
-        else:
-            prediction = "Low Risk"
-            confidence = "Medium"
+        categories = np.where(probabilities >= 60, CATEGORY_HIGH,
+                              np.where(probabilities >= 30, CATEGORY_MODERATE, CATEGORY_LOW))
         
         # Special case for very high creatinine
-        if input_data[0][0] > 4.0:  # sc > 4.0
-            prediction = "High Risk"
-            probability = max(probability, 85)
-            confidence = "High"
+        very_high_sc = X[:, 0] > 4.0
+        categories = np.where(very_high_sc, CATEGORY_HIGH, categories)
+        probabilities = np.where(very_high_sc, np.maximum(probabilities, 85), probabilities)
         
-        return prediction, probability, risk_factors, confidence
+        return categories, probabilities, risk_masks
+    
+    def risk_factor_names(self, risk_mask, al):
+        """Build the risk factor strings for one row's bitmask"""
+        risk_factors = []
+        for bit, label in self.risk_labels:
+            if risk_mask & bit:
+                if bit == RISK_ALBUMIN_HIGH:
+                    label = f"Proteinuria ({self.albumin_levels[int(al) - 1]})"
+                risk_factors.append(label)
+        return risk_factors
+    
+    def extract_risk_factors(self, data):
+        """Extract risk factors from patient data"""
+        risk_scores, risk_masks = self.score_batch(data)
+        return self.risk_factor_names(risk_masks[0], data[2]), float(risk_scores[0])
+    
+    def predict_fallback(self, input_data):
+        """Fallback prediction when model is not available"""
+        categories, probabilities, risk_masks = self.predict_batch(input_data)
+        prediction = RISK_CATEGORIES[categories[0]]
+        confidence = "High" if categories[0] == CATEGORY_HIGH else "Medium"
+        risk_factors = self.risk_factor_names(risk_masks[0], input_data[0][2])
+        return prediction, float(probabilities[0]), risk_factors, confidence
 
 # Initialize fallback predictor
 fallback_predictor = CKDPredictor()
 
 # Input preprocessing function
+def parse_error(form_data):
+    """Message naming the first field of a record that cannot be parsed"""
+    for feature in FEATURES:
+        if feature not in form_data:
+            return f'Missing required field: {feature}'
+        value = form_data[feature]
+        if feature in FLAG_FEATURES and isinstance(value, str):
+            continue
+        parse = int if feature in INTEGER_FEATURES or feature in FLAG_FEATURES else float
+        try:
+            parse(value)
+        except (ValueError, TypeError, OverflowError):
+            return f"Invalid input: could not parse {feature}"
+    return "Invalid input"
+
 def preprocess_input(form_data):
-    """Preprocess input data for model prediction"""
+    """Preprocess input data for model prediction
+
+    Parse errors name the field, with the same messages as src/validation.py.
+    """
     try:
         sc = float(form_data['sc'])
         hemo = float(form_data['hemo'])
@@ -156,119 +650,579 @@ def preprocess_input(form_data):
         
         # Handle different input formats for dm and htn
         if isinstance(form_data['dm'], str):
-            dm = 1 if form_data['dm'].lower() in ['yes', '1', 'true'] else 0
+            dm = 1 if form_data['dm'].lower() in FLAG_TRUE_VALUES else 0
         else:
             dm = int(form_data['dm'])
             
         if isinstance(form_data['htn'], str):
-            htn = 1 if form_data['htn'].lower() in ['yes', '1', 'true'] else 0
+            htn = 1 if form_data['htn'].lower() in FLAG_TRUE_VALUES else 0
         else:
             htn = int(form_data['htn'])
             
-    except (ValueError, KeyError) as e:
-        return None, f"Invalid input: {str(e)}"
+    except (ValueError, KeyError, TypeError, OverflowError):
+        # Only failed records pay for working out which field is at fault
+        return None, parse_error(form_data)
 
     # Validate ranges
-    if not (0.1 <= sc <= 20.0):
-        return None, "Serum Creatinine must be between 0.1 and 20.0 mg/dL"
-    if not (2.0 <= hemo <= 20.0):
-        return None, "Hemoglobin must be between 2.0 and 20.0 g/dL"
-    if not (1.000 <= sg <= 1.040):
-        return None, "Specific Gravity must be between 1.000 and 1.040"
-    if not (10.0 <= pcv <= 60.0):
-        return None, "Packed Cell Volume must be between 10 and 60%"
-    if not (1.0 <= rbcc <= 10.0):
-        return None, "Red Blood Cell Count must be between 1.0 and 10.0 millions/μL"
-
-    return np.array([[sc, hemo, al, sg, pcv, rbcc, dm, htn]]), None
+    row = [sc, hemo, al, sg, pcv, rbcc, dm, htn]
+    for feature, low, high, message in RANGE_CHECKS:
+        if not (low <= row[FEATURES.index(feature)] <= high):
+            return None, message
+
+    return np.array([row]), None
 
 @app.route('/')
 def index():
     """Render the main page"""
     return render_template('index.html')
 
+def check_required_fields(form_data):
+    """Return an error message if a record is not an object with every required field"""
+    if not isinstance(form_data, dict):
+        return 'Invalid record: expected an object with the required fields'
+
+    for field in FEATURE_NAMES:
+        if field not in form_data or form_data[field] == '':
+            return f'Missing required field: {field}'
+    return None
+
+def validate_record(form_data):
+    """Check required fields and preprocess a single record"""
+    error = check_required_fields(form_data)
+    if error is not None:
+        return None, error
+
+    return preprocess_input(form_data)
+
+def predict_rows(input_data):
+    """Score an (N, 8) array of preprocessed rows in one model call
+
+    Returns a dict of per-row arrays (category, probability, risk mask, confidence,
+    and with the flat forest the model's per-feature contributions to the CKD
+    probability), plus the model_version that scored them. Use scored_row() to turn
+    one row into response values; risk factor strings are only built there. Falls
+    back to the rule engine if the model is unavailable or fails.
+    """
+    model, forest, version = active_model  # One snapshot, even if the registry swaps mid-call
+    categories = probabilities = None
+    contributions = baseline = None
+    t = time.perf_counter()
+    if model is not None:
+        try:
+            # Use trained model - a single predict_proba call covers every row
+            if forest is not None and ATTRIBUTIONS_ENABLED:
+                # Same tree walk as predict_proba, plus the tree-path attribution of each split
+                proba, bias, class_contributions = forest.explain(input_data)
+                predictions_raw = forest.classes_[proba.argmax(axis=1)]
+                probabilities = proba[:, 1] * 100  # Probability of CKD (class 1)
+                contributions = class_contributions[:, :, 1] * 100
+                baseline = float(bias[1] * 100)
+            elif forest is not None:
+                proba = forest.predict_proba(input_data)
+                predictions_raw = forest.classes_[proba.argmax(axis=1)]
+                probabilities = proba[:, 1] * 100  # Probability of CKD (class 1)
+            elif hasattr(model, 'predict_proba'):
+                proba = model.predict_proba(input_data)
+                predictions_raw = model.classes_[proba.argmax(axis=1)]
+                probabilities = proba[:, 1] * 100  # Probability of CKD (class 1)
+            else:
+                predictions_raw = model.predict(input_data)
+                probabilities = np.where(predictions_raw == 1, 85.0, 15.0)
+
+            # Convert numerical prediction to a risk category
+            categories = np.where(predictions_raw == 1, CATEGORY_HIGH, CATEGORY_LOW)
+            high_confidence = np.ones(len(input_data), dtype=bool)
+            t = metrics.stage('engine', 'inference', t)
+
+            # Extract risk factors for explanation
+            _, risk_masks = fallback_predictor.score_batch(input_data)
+            metrics.stage('engine', 'risk_factors', t)
+            metrics.inc('ckd_predictions_total', len(input_data), help='Rows scored, by scoring path', path='model')
+
+        except Exception as e:
+            print(f"Model prediction error: {e}")
+            metrics.inc('ckd_model_errors_total', help='Model failures that fell back to the rule engine')
+            categories = None
+            contributions = baseline = None
+
+    if categories is None:
+        # Fallback to rule-based prediction
+        categories, probabilities, risk_masks = fallback_predictor.predict_batch(input_data)
+        high_confidence = categories == CATEGORY_HIGH
+        metrics.stage('engine', 'fallback', t)
+        metrics.inc('ckd_predictions_total', len(input_data), help='Rows scored, by scoring path', path='fallback')
+
+    return {
+        'category': categories,
+        'probability': probabilities,
+        'risk_mask': risk_masks,
+        'high_confidence': high_confidence,
+        'albumin': np.asarray(input_data)[:, 2],
+        'contributions': contributions,
+        'baseline': baseline,
+        'model_version': version,
+    }
+
+def scored_row(scored, i):
+    """Return (prediction, probability, risk_factors, confidence, attributions) for row i of predict_rows()
+
+    attributions is None unless the model's feature contributions were computed.
+    """
+    attributions = None
+    if scored['contributions'] is not None:
+        attributions = {
+            'baseline': scored['baseline'],
+            'contributions': dict(zip(FEATURE_NAMES, scored['contributions'][i].tolist())),
+        }
+    return (
+        RISK_CATEGORIES[scored['category'][i]],
+        float(scored['probability'][i]),
+        fallback_predictor.risk_factor_names(scored['risk_mask'][i], scored['albumin'][i]),
+        "High" if scored['high_confidence'][i] else "Medium",
+        attributions,
+    )
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one batched inference call
+
+    Request threads submit a preprocessed row and block on a Future. A worker thread
+    takes the first waiting row, keeps collecting until the window expires or the
+    batch is full, scores everything with predict_rows() and hands each request
+    back its (scored, index) pair.
+    """
+
+    def __init__(self, window_ms=2.0, max_rows=64):
+        self.window = window_ms / 1000.0
+        self.max_rows = max_rows
+        self._pending = []
+        self._cond = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+
+        # Tuning statistics
+        self.batch_size_buckets = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+        self.batch_size_histogram = [0] * (len(self.batch_size_buckets) + 1)
+        self.wait_buckets_ms = [0.5, 1, 2, 5, 10, 25, 50, 100]
+        self.wait_histogram = [0] * (len(self.wait_buckets_ms) + 1)
+        self.batches = 0
+        self.rows = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _ensure_worker(self):
+        # Start the worker lazily, and again after a fork (e.g. gunicorn --preload)
+        if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+            self._worker_pid = os.getpid()
+            self._pending = []
+            self._worker = threading.Thread(target=self._run, name='microbatcher', daemon=True)
+            self._worker.start()
+
+    def submit(self, row):
+        """Queue one preprocessed row; returns a Future resolving to (scored, index)"""
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._pending.append((row, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def predict(self, row):
+        """Score one row through the batcher, blocking until its batch is done"""
+        scored, index = self.submit(row).result()
+        return scored_row(scored, index)
+
+    def _next_batch(self):
+        # Wait for a first row, then gather more until the window closes or the batch is full
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.perf_counter() + self.window
+            while len(self._pending) < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_rows]
+            del self._pending[:self.max_rows]
+        return batch
+
+    def _record(self, batch, started):
+        # Update batch size and queue wait histograms
+        with self._cond:
+            self.batches += 1
+            self.rows += len(batch)
+            self.batch_size_histogram[self._bucket(self.batch_size_buckets, len(batch))] += 1
+            for _, _, queued in batch:
+                wait = started - queued
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                self.wait_histogram[self._bucket(self.wait_buckets_ms, wait * 1000)] += 1
+
+    @staticmethod
+    def _bucket(bounds, value):
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                return i
+        return len(bounds)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            self._record(batch, started)
+            try:
+                scored = predict_rows(np.array([row for row, _, _ in batch]))
+                for i, (_, future, _) in enumerate(batch):
+                    future.set_result((scored, i))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+
+    def stats(self):
+        """Snapshot of queue depth, batch size histogram and wait times"""
+        with self._cond:
+            def histogram(bounds, counts):
+                # Ordered buckets; 'le' is the inclusive upper bound
+                return [{'le': bound, 'count': count} for bound, count in zip(bounds + ['inf'], counts)]
+            return {
+                'window_ms': self.window * 1000,
+                'max_rows': self.max_rows,
+                'queue_depth': len(self._pending),
+                'batches': self.batches,
+                'rows': self.rows,
+                'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+                'batch_size_histogram': histogram(self.batch_size_buckets, self.batch_size_histogram),
+                'mean_wait_ms': self.total_wait * 1000 / self.rows if self.rows else 0.0,
+                'max_wait_ms': self.max_wait * 1000,
+                'wait_histogram_ms': histogram(self.wait_buckets_ms, self.wait_histogram),
+            }
+
+# Opt-in request coalescing for concurrent /predict traffic
+microbatcher = MicroBatcher(MICROBATCH_WINDOW_MS, MICROBATCH_MAX_ROWS) if MICROBATCH_ENABLED else None
+
+def round_to_lab_precision(input_data):
+    """Round preprocessed rows to lab precision; used for prediction cache keys only, never for scoring"""
+    return np.array([np.round(column, decimals) for column, decimals in zip(input_data.T, LAB_PRECISION)]).T
+
+class ResultCache:
+    """Bounded LRU cache of computed results with a time-to-live
+
+    Used for predictions (keyed on rounded feature vectors) and rendered reports
+    (keyed on a payload hash). Entries are tied to the model version they were
+    computed with, and the whole cache is dropped when that version changes.
+    """
+
+    def __init__(self, max_size=10000, ttl=3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        # Called with the lock held
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key, version):
+        """Return the cached result for key, or None"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, value):
+        """Store a result, evicting the least recently used entries beyond max_size"""
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Snapshot of cache size and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'model_version': self._version,
+            }
+
+# Prediction result cache (disable with PREDICTION_CACHE_SIZE=0)
+prediction_cache = ResultCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL) if PREDICTION_CACHE_SIZE > 0 else None
+
+def predict_one(input_data):
+    """Score a single preprocessed row, using the result cache and micro-batcher when enabled
+
+    Returns (prediction, probability, risk_factors, confidence, attributions). The
+    cache key is the row rounded to lab precision, but a miss always scores the
+    validated row itself, so /predict and /predict_batch agree on identical input.
+    """
+    if prediction_cache is not None:
+        key = tuple(round_to_lab_precision(input_data)[0].tolist())
+        cached = prediction_cache.get(key, active_model[2])
+        if cached is not None:
+            metrics.inc('ckd_predictions_total', help='Rows scored, by scoring path', path='cache')
+            prediction, probability, risk_factors, confidence, attributions = cached
+            return prediction, probability, list(risk_factors), confidence, attributions
+
+    if microbatcher is not None:
+        scored, index = microbatcher.submit(input_data[0]).result()
+    else:
+        scored, index = predict_rows(input_data), 0
+    prediction, probability, risk_factors, confidence, attributions = scored_row(scored, index)
+
+    if prediction_cache is not None:
+        # Stored under the version that actually scored the row, which a registry swap
+        # may have changed since the lookup. Cached attributions are shared between
+        # responses, which only serialize them.
+        prediction_cache.put(key, scored['model_version'],
+                             (prediction, probability, tuple(risk_factors), confidence, attributions))
+    return prediction, probability, risk_factors, confidence, attributions
+
+def load_shadow_model(path):
+    """Load a candidate model: an artifact directory or a pickled model"""
+    if os.path.isdir(path):
+        return FlatForest.load_mmap(path)
+    import joblib
+    return joblib.load(path)
+
+class ShadowScorer:
+    """Score a candidate model on live /predict rows without touching the response
+
+    Requests hand their preprocessed row and the served result to submit(), which
+    never blocks: when the bounded queue is full the row is dropped and counted.
+    Worker threads score the candidate and keep agreement, probability-delta and
+    latency statistics, printed every log_every rows and served by /shadow_stats.
+    """
+
+    delta_buckets = [1, 2, 5, 10, 20, 50, 100]  # Absolute probability difference, in points
+
+    def __init__(self, candidate, name, workers=1, queue_size=1000, log_every=1000):
+        self.candidate = candidate
+        self.name = name
+        self.workers = workers
+        self.log_every = log_every
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._threads_pid = None
+        self._lock = threading.Lock()
+
+        self.scored = 0
+        self.agreed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.total_abs_delta = 0.0
+        self.max_abs_delta = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.delta_histogram = [0] * (len(self.delta_buckets) + 1)
+
+    def _ensure_workers(self):
+        # Start the workers lazily, and again after a fork (e.g. gunicorn --preload)
+        if self._threads_pid != os.getpid():
+            self._threads_pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._threads = [threading.Thread(target=self._run, name=f'shadow-{i}', daemon=True)
+                             for i in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def submit(self, input_data, prediction, probability):
+        """Queue one served result for shadow scoring, or drop it if the queue is full"""
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((input_data, prediction, probability))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            metrics.inc('ckd_shadow_total', help='Shadow-scored rows, by result', result='dropped')
+
+    def _run(self):
+        while True:
+            input_data, prediction, probability = self._queue.get()
+            start = time.perf_counter()
+            try:
+                proba = self.candidate.predict_proba(input_data)
+                label = self.candidate.classes_[proba.argmax(axis=1)][0]
+            except Exception as e:
+                print(f"Shadow model error: {e}")
+                with self._lock:
+                    self.errors += 1
+                metrics.inc('ckd_shadow_total', help='Shadow-scored rows, by result', result='error')
+                continue
+            metrics.stage('shadow', 'inference', start)
+            self._record(prediction, probability, label, float(proba[0, 1] * 100), time.perf_counter() - start)
+
+    def _record(self, prediction, probability, label, candidate_probability, latency):
+        # The candidate agrees when it puts the row on the same side as the served prediction
+        agree = (label == 1) == (prediction == "High Risk")
+        delta = abs(candidate_probability - probability)
+        metrics.inc('ckd_shadow_total', help='Shadow-scored rows, by result', result='agree' if agree else 'disagree')
+        with self._lock:
+            self.scored += 1
+            self.agreed += agree
+            self.total_abs_delta += delta
+            self.max_abs_delta = max(self.max_abs_delta, delta)
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.delta_histogram[bisect_left(self.delta_buckets, delta)] += 1
+            report = self.log_every and self.scored % self.log_every == 0
+        if report:
+            stats = self.stats()
+            print(f"Shadow {self.name}: {stats['scored']} rows, agreement {stats['agreement_rate']:.2%}, "
+                  f"mean |delta| {stats['mean_abs_delta']:.2f} points, mean latency {stats['mean_latency_ms']:.3f} ms, "
+                  f"{stats['dropped']} dropped")
+
+    def stats(self):
+        """Snapshot of shadow agreement, deltas, latency and drops"""
+        with self._lock:
+            return {
+                'candidate': self.name,
+                'scored': self.scored,
+                'agreement_rate': self.agreed / self.scored if self.scored else 0.0,
+                'mean_abs_delta': self.total_abs_delta / self.scored if self.scored else 0.0,
+                'max_abs_delta': self.max_abs_delta,
+                'abs_delta_histogram': [{'le': bound, 'count': count} for bound, count
+                                        in zip(self.delta_buckets + ['inf'], self.delta_histogram)],
+                'mean_latency_ms': self.total_latency * 1000 / self.scored if self.scored else 0.0,
+                'max_latency_ms': self.max_latency * 1000,
+                'queue_depth': self._queue.qsize(),
+                'queue_size': self._queue.maxsize,
+                'dropped': self.dropped,
+                'errors': self.errors,
+            }
+
+# Shadow scoring of a candidate model (enable with SHADOW_MODEL_PATH)
+shadow_scorer = None
+if SHADOW_MODEL_PATH:
+    try:
+        shadow_scorer = ShadowScorer(load_shadow_model(SHADOW_MODEL_PATH), SHADOW_MODEL_PATH,
+                                     SHADOW_WORKERS, SHADOW_QUEUE_SIZE, SHADOW_LOG_EVERY)
+        print(f"Shadow model loaded from {SHADOW_MODEL_PATH}")
+    except Exception as e:
+        print(f"Error loading shadow model: {e}")
+
+def build_result(form_data, prediction, probability, risk_factors, confidence, attributions=None):
+    """Build the JSON result returned for a single prediction
+
+    When the model's attributions are available they are added as
+    featureContributions: the average CKD probability over the training data
+    (baseline) and each feature's contribution, in percentage points, which sum
+    to the probability.
+    """
+    result = {
+        'prediction': prediction,
+        'probability': probability,
+        'riskFactors': risk_factors,
+        'confidence': confidence,
+        'formData': form_data,
+        'success': True
+    }
+    if attributions is not None:
+        result['featureContributions'] = attributions
+    return result
+
+def validate_prediction_request(form_data, t):
+    """Validate a parsed /predict body, recording its stage timings
+
+    Returns (input_data, error, t). Shared by the Flask and ASGI /predict handlers.
+    """
+    input_data = None
+    error = check_required_fields(form_data)
+    t = metrics.stage('predict', 'required_fields', t)
+    if error is None:
+        input_data, error = preprocess_input(form_data)
+        t = metrics.stage('predict', 'preprocess', t)
+    if error is not None:
+        metrics.inc('ckd_errors_total', help='Failed requests, by endpoint and kind', endpoint='predict', kind='validation')
+    return input_data, error, t
+
+def prediction_result(form_data, input_data, scored):
+    """Hand a scored /predict row to the shadow scorer and build its JSON result
+
+    scored is the tuple predict_one() returns.
+    """
+    prediction, probability, risk_factors, confidence, attributions = scored
+    if shadow_scorer is not None:
+        shadow_scorer.submit(input_data, prediction, probability)
+    return build_result(form_data, prediction, probability, risk_factors, confidence, attributions)
+
+def prediction_page_text(prediction):
+    """Result page message for a form submission"""
+    if prediction == "High Risk":
+        return "⚠️ CKD Detected. Please consult a healthcare professional for further evaluation."
+    return "✅ No CKD detected. Keep monitoring and stay healthy."
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """Handle prediction requests - supports both form and JSON data"""
+    start = t = time.perf_counter()
     try:
         # Handle both JSON and form data
         if request.is_json:
             form_data = request.get_json()
         else:
             form_data = request.form.to_dict()
+        t = metrics.stage('predict', 'parse', t)
         
-        # Validate required fields
-        required_fields = FEATURE_NAMES
-        for field in required_fields:
-            if field not in form_data or form_data[field] == '':
-                return jsonify({
-                    'error': f'Missing required field: {field}',
-                    'success': False
-                }), 400
-        
-        # Preprocess input
-        input_data, error = preprocess_input(form_data)
-        if input_data is None:
+        # Validate required fields and preprocess input
+        input_data, error, t = validate_prediction_request(form_data, t)
+        if error is not None:
             return jsonify({
                 'error': error,
                 'success': False
             }), 400
         
         # Make prediction
-        if model is not None:
-            try:
-                # Use trained model
-                prediction_raw = model.predict(input_data)[0]
-                
-                # Get probability if available
-                if hasattr(model, 'predict_proba'):
-                    proba = model.predict_proba(input_data)[0]
-                    probability = proba[1] * 100  # Probability of CKD (class 1)
-                else:
-                    probability = 85.0 if prediction_raw == 1 else 15.0
-                
-                # Convert numerical prediction to text
-                if prediction_raw == 1:
-                    prediction = "High Risk"
-                    confidence = "High"
-                else:
-                    prediction = "Low Risk" 
-                    confidence = "High"
-                
-                # Extract risk factors for explanation
-                risk_factors, _ = fallback_predictor.extract_risk_factors(input_data[0])
-                
-            except Exception as e:
-                print(f"Model prediction error: {e}")
-                # Fallback to rule-based prediction
-                prediction, probability, risk_factors, confidence = fallback_predictor.predict_fallback(input_data)
-        else:
-            # Use fallback predictor
-            prediction, probability, risk_factors, confidence = fallback_predictor.predict_fallback(input_data)
+        scored = predict_one(input_data)
+        t = metrics.stage('predict', 'predict', t)
         
         # Prepare response
-        result = {
-            'prediction': prediction,
-            'probability': probability,
-            'riskFactors': risk_factors,
-            'confidence': confidence,
-            'formData': form_data,
-            'success': True
-        }
+        result = prediction_result(form_data, input_data, scored)
         
         # Handle non-JSON requests (original form submission)
         if not request.is_json:
-            if prediction == "High Risk":
-                result_text = "⚠️ CKD Detected. Please consult a healthcare professional for further evaluation."
-            else:
-                result_text = "✅ No CKD detected. Keep monitoring and stay healthy."
-            return render_template('result.html', prediction=result_text)
+            return render_template('result.html', prediction=prediction_page_text(scored[0]))
         
-        return jsonify(result)
+        response = jsonify(result)
+        metrics.stage('predict', 'serialize', t)
+        metrics.stage('predict', 'total', start)
+        return response
         
     except Exception as e:
         error_msg = f'An error occurred during prediction: {str(e)}'
         print(error_msg)
+        metrics.inc('ckd_errors_total', help='Failed requests, by endpoint and kind', endpoint='predict', kind='exception')
         
         if request.is_json:
             return jsonify({
@@ -278,18 +1232,230 @@ def predict():
         else:
             return render_template('result.html', prediction="An error occurred. Please try again.")
 
-@app.route('/download_report', methods=['POST'])
-def download_report():
-    """Generate and download PDF report"""
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """Score many patient records in a single model call
+
+    Accepts a JSON list of records, or an object with a 'records' list. Each record
+    gets either a result in the same shape /predict returns, or its own validation error.
+    An application/x-npy body is handled by predict_batch_binary().
+    """
+    if request.mimetype == NPY_MIMETYPE:
+        return predict_batch_binary()
+    start = t = time.perf_counter()
     try:
-        # Get prediction data from request
-        data = request.get_json()
+        payload = request.get_json(silent=True)
+        records = payload.get('records') if isinstance(payload, dict) else payload
+        t = metrics.stage('predict_batch', 'parse', t)
+        if not isinstance(records, list):
+            return jsonify({
+                'error': "Expected a JSON list of records or an object with a 'records' list",
+                'success': False
+            }), 400
+        if len(records) > MAX_BATCH_SIZE:
+            return jsonify({
+                'error': f'Batch too large: {len(records)} records (maximum {MAX_BATCH_SIZE})',
+                'success': False
+            }), 413
+
+        # Validate every record, keeping per-row errors in place
+        results = [None] * len(records)
+        valid_rows = []
+        valid_index = []
+        for i, form_data in enumerate(records):
+            input_data, error = validate_record(form_data)
+            if input_data is None:
+                results[i] = {'error': error, 'success': False}
+            else:
+                valid_rows.append(input_data[0])
+                valid_index.append(i)
+        t = metrics.stage('predict_batch', 'validate', t)
+        if len(valid_rows) < len(records):
+            metrics.inc('ckd_errors_total', len(records) - len(valid_rows), help='Failed requests, by endpoint and kind',
+                        endpoint='predict_batch', kind='validation')
+
+        # Score all valid rows together
+        if valid_rows:
+            scored = predict_rows(np.array(valid_rows))
+            t = metrics.stage('predict_batch', 'predict', t)
+            for j, i in enumerate(valid_index):
+                results[i] = build_result(records[i], *scored_row(scored, j))
+
+        response = jsonify({
+            'results': results,
+            'count': len(results),
+            'errors': len(results) - len(valid_rows),
+            'success': True
+        })
+        metrics.stage('predict_batch', 'serialize', t)
+        metrics.stage('predict_batch', 'total', start)
+        return response
+
+    except Exception as e:
+        error_msg = f'An error occurred during batch prediction: {str(e)}'
+        print(error_msg)
+        metrics.inc('ckd_errors_total', help='Failed requests, by endpoint and kind', endpoint='predict_batch', kind='exception')
+        return jsonify({
+            'error': error_msg,
+            'success': False
+        }), 500
+
+# Binary bulk format: an NPY array of shape (N, 8) in FEATURE_NAMES order in, an NPZ of result
+# columns out. risk_labels lists the risk_mask bits in order, lowest first.
+NPY_MIMETYPE = 'application/x-npy'
+NPZ_MIMETYPE = 'application/x-npz'
+
+# float32 values are rounded to this many decimals so they score exactly like the decimal
+# strings they came from (float32 keeps about 7 significant digits, enough for every feature)
+FLOAT32_DECIMALS = LAB_PRECISION + 2
+
+def read_npy_batch(body):
+    """Parse an NPY payload into an (N, 8) float64 array; returns (X, error message)"""
+    if not body.startswith(b'\x93NUMPY'):
+        return None, 'Invalid NPY payload: missing NPY header'
+    try:
+        X = np.load(io.BytesIO(body), allow_pickle=False)
+    except (ValueError, OSError, EOFError) as e:
+        return None, f'Invalid NPY payload: {e}'
+    if not isinstance(X, np.ndarray) or X.ndim != 2 or X.shape[1] != len(FEATURE_NAMES):
+        return None, f'Expected an NPY array of shape (N, {len(FEATURE_NAMES)}) in order {",".join(FEATURE_NAMES)}'
+    if X.dtype.kind != 'f' or X.dtype.byteorder == '>' or X.dtype.itemsize not in (4, 8):
+        return None, f'Expected little-endian float32 or float64 values, got {X.dtype.str}'
+    if X.dtype.itemsize == 4:
+        X = X.astype(np.float64)
+        for j, decimals in enumerate(FLOAT32_DECIMALS):
+            X[:, j] = np.round(X[:, j], decimals)
+    return X, None
+
+def predict_batch_binary():
+    """Score an NPY batch with vectorized validation and no per-row Python objects
+
+    Responds with an NPZ of result columns when the client accepts application/x-npz,
+    otherwise with JSON lists. Invalid rows get category -1, a NaN probability and a
+    non-zero error code indexing error_messages. With the flat forest, an (N, 8)
+    contributions column and the baseline are included as well.
+    """
+    start = t = time.perf_counter()
+    try:
+        X, error = read_npy_batch(request.get_data())
+        if X is None:
+            return jsonify({'error': error, 'success': False}), 400
+        if len(X) > MAX_BATCH_SIZE:
+            return jsonify({
+                'error': f'Batch too large: {len(X)} records (maximum {MAX_BATCH_SIZE})',
+                'success': False
+            }), 413
+        t = metrics.stage('predict_batch', 'parse', t)
+
+        X, errors = validate_array(X)
+        valid = ~errors.astype(bool)  # Messages are non-empty strings, valid rows hold None
+        t = metrics.stage('predict_batch', 'validate', t)
+        if not valid.all():
+            metrics.inc('ckd_errors_total', int((~valid).sum()), help='Failed requests, by endpoint and kind',
+                        endpoint='predict_batch', kind='validation')
+
+        # Result columns; invalid rows keep the placeholders
+        n = len(X)
+        category = np.full(n, -1, dtype=np.int8)
+        probability = np.full(n, np.nan)
+        risk_mask = np.zeros(n, dtype=np.uint16)
+        high_confidence = np.zeros(n, dtype=bool)
+        contributions = baseline = None
+        if valid.any():
+            scored = predict_rows(X[valid])
+            category[valid] = scored['category']
+            probability[valid] = scored['probability']
+            risk_mask[valid] = scored['risk_mask']
+            high_confidence[valid] = scored['high_confidence']
+            if scored['contributions'] is not None:
+                contributions = np.full((n, len(FEATURE_NAMES)), np.nan)
+                contributions[valid] = scored['contributions']
+                baseline = scored['baseline']
+            t = metrics.stage('predict_batch', 'predict', t)
+
+        # Error codes index error_messages; 0 means valid
+        messages, codes = np.unique(errors[~valid].astype(str), return_inverse=True)
+        error_code = np.zeros(n, dtype=np.int16)
+        error_code[~valid] = codes.ravel() + 1
+        error_messages = np.concatenate([[''], messages]).astype(str)
+
+        if request.accept_mimetypes.best_match(['application/json', NPZ_MIMETYPE]) == NPZ_MIMETYPE:
+            attribution_columns = {}
+            if contributions is not None:
+                attribution_columns = {'contributions': contributions, 'baseline': np.array(baseline),
+                                       'feature_names': np.array(FEATURE_NAMES)}
+            buffer = io.BytesIO()
+            np.savez(buffer, category=category, probability=probability, risk_mask=risk_mask,
+                     high_confidence=high_confidence, error_code=error_code, error_messages=error_messages,
+                     categories=np.array(RISK_CATEGORIES),
+                     risk_labels=np.array([label or "Proteinuria" for _, label in fallback_predictor.risk_labels]),
+                     **attribution_columns)
+            response = Response(buffer.getvalue(), mimetype=NPZ_MIMETYPE)
+        else:
+            result = {
+                'prediction': [RISK_CATEGORIES[c] if c >= 0 else None for c in category.tolist()],
+                'probability': [None if p != p else p for p in probability.tolist()],
+                'risk_mask': risk_mask.tolist(),
+                'error': [error_messages[c] if c else None for c in error_code.tolist()],
+                'count': n,
+                'errors': int((~valid).sum()),
+                'success': True
+            }
+            if contributions is not None:
+                result['baseline'] = baseline
+                result['contributions'] = [row if ok else None for row, ok in zip(contributions.tolist(), valid.tolist())]
+            response = jsonify(result)
+        metrics.stage('predict_batch', 'serialize', t)
+        metrics.stage('predict_batch', 'total', start)
+        return response
+
+    except Exception as e:
+        error_msg = f'An error occurred during batch prediction: {str(e)}'
+        print(error_msg)
+        metrics.inc('ckd_errors_total', help='Failed requests, by endpoint and kind', endpoint='predict_batch', kind='exception')
+        return jsonify({
+            'error': error_msg,
+            'success': False
+        }), 500
+
+@app.route('/microbatch_stats')
+def microbatch_stats():
+    """Report micro-batching queue statistics for tuning the window"""
+    if microbatcher is None:
+        return jsonify({'enabled': False, 'success': True})
+    return jsonify({'enabled': True, **microbatcher.stats(), 'success': True})
+
+@app.route('/shadow_stats')
+def shadow_stats():
+    """Report how the shadow candidate compares with the served model"""
+    if shadow_scorer is None:
+        return jsonify({'enabled': False, 'success': True})
+    return jsonify({'enabled': True, **shadow_scorer.stats(), 'success': True})
+
+@app.route('/cache_stats')
+def cache_stats():
+    """Report prediction cache size and hit/miss/eviction counters"""
+    if prediction_cache is None:
+        return jsonify({'enabled': False, 'success': True})
+    return jsonify({'enabled': True, **prediction_cache.stats(), 'success': True})
+
+# Report building blocks, created on first use and shared by every render.
+# ReportLab is imported here rather than at module load to keep worker cold start fast.
+_report_blocks = None
+_report_blocks_lock = threading.Lock()
+
+def get_report_blocks():
+    """Return the shared report styles and static flowables, building them once"""
+    global _report_blocks
+    with _report_blocks_lock:
+        if _report_blocks is not None:
+            return _report_blocks
         
-        # Create PDF in memory
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=1*inch)
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import Paragraph, TableStyle
+        from reportlab.lib import colors
+        from reportlab.lib.units import inch
         
-        # Define styles
         styles = getSampleStyleSheet()
         title_style = ParagraphStyle(
             'CustomTitle',
@@ -299,7 +1465,6 @@ def download_report():
             textColor=colors.darkblue,
             alignment=1  # Center alignment
         )
-        
         heading_style = ParagraphStyle(
             'CustomHeading',
             parent=styles['Heading2'],
@@ -307,101 +1472,700 @@ def download_report():
             spaceAfter=12,
             textColor=colors.darkblue
         )
-        
-        # Build PDF content
-        story = []
-        
-        # Title
-        story.append(Paragraph("CKD DETECTION REPORT", title_style))
-        story.append(Spacer(1, 20))
-        
-        # Date and time
-        current_time = datetime.now()
-        story.append(Paragraph(f"<b>Generated:</b> {current_time.strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Patient Data Section
-        story.append(Paragraph("PATIENT DATA", heading_style))
-        
-        patient_data = [
-            ['Parameter', 'Value', 'Normal Range'],
-            ['Serum Creatinine', f"{data['formData']['sc']} mg/dL", '0.6 - 1.3 mg/dL'],
-            ['Hemoglobin', f"{data['formData']['hemo']} g/dL", '12.0 - 17.0 g/dL'],
-            ['Albumin Level', data['formData']['al'], '0 (Normal)'],
-            ['Specific Gravity', data['formData']['sg'], '1.010 - 1.025'],
-            ['Packed Cell Volume', f"{data['formData']['pcv']}%", '36 - 48%'],
-            ['Red Blood Cell Count', f"{data['formData']['rbcc']} millions/μL", '4.2 - 5.4 millions/μL'],
-            ['Diabetes Mellitus', 'Yes' if str(data['formData']['dm']) == '1' else 'No', 'No'],
-            ['Hypertension', 'Yes' if str(data['formData']['htn']) == '1' else 'No', 'No']
-        ]
-        
-        patient_table = Table(patient_data, colWidths=[2.5*inch, 1.5*inch, 2*inch])
-        patient_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(patient_table)
-        story.append(Spacer(1, 20))
-        
-        # Prediction Results Section
-        story.append(Paragraph("PREDICTION RESULTS", heading_style))
-        
-        # Risk assessment with color coding
-        risk_color = colors.red if data['prediction'] == 'High Risk' else colors.orange if 'Moderate' in data['prediction'] else colors.green
-        story.append(Paragraph(f"<b>Risk Assessment:</b> <font color='{risk_color.hexval()}'>{data['prediction']}</font>", styles['Normal']))
-        story.append(Paragraph(f"<b>Probability:</b> {data['probability']:.1f}%", styles['Normal']))
-        story.append(Paragraph(f"<b>Confidence:</b> {data.get('confidence', 'N/A')}", styles['Normal']))
-        story.append(Spacer(1, 12))
-        
-        # Risk factors
-        if data.get('riskFactors') and len(data['riskFactors']) > 0:
-            story.append(Paragraph("<b>Identified Risk Factors:</b>", styles['Normal']))
-            for factor in data['riskFactors']:
-                story.append(Paragraph(f"• {factor}", styles['Normal']))
-        else:
-            story.append(Paragraph("<b>Risk Factors:</b> None identified", styles['Normal']))
-        
-        story.append(Spacer(1, 30))
-        
-        # Model information
-        model_info = "Machine Learning Model" if model is not None else "Rule-based Clinical Assessment"
-        story.append(Paragraph(f"<b>Analysis Method:</b> {model_info}", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Disclaimer
-        story.append(Paragraph("IMPORTANT DISCLAIMER", heading_style))
-        disclaimer_text = """
+        _report_blocks = {
+            'styles': styles,
+            'patient_table_style': TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]),
+            'patient_table_col_widths': [2.5*inch, 1.5*inch, 2*inch],
+            'title': Paragraph("CKD DETECTION REPORT", title_style),
+            'headings': {
+                name: Paragraph(name, heading_style)
+                for name in ["PATIENT DATA", "PREDICTION RESULTS", "MODEL EXPLANATION", "IMPORTANT DISCLAIMER"]
+            },
+            'disclaimer': Paragraph("""
         This AI-generated report is for informational purposes only and not a substitute for professional medical advice.
         Always consult a qualified healthcare provider with any medical concerns.
-        """
-        story.append(Paragraph(disclaimer_text, styles['Normal']))
+        """, styles['Normal']),
+            'no_risk_factors': Paragraph("<b>Risk Factors:</b> None identified", styles['Normal']),
+            'risk_factors_header': Paragraph("<b>Identified Risk Factors:</b>", styles['Normal']),
+        }
+        return _report_blocks
+
+def _shared(flowable):
+    # Flowables store layout state while a document is built, so each render gets its own shallow copy
+    return copy.copy(flowable)
+
+# Report labels for the model's input features
+FEATURE_LABELS = {
+    'sc': 'Serum Creatinine',
+    'hemo': 'Hemoglobin',
+    'al': 'Albumin Level',
+    'sg': 'Specific Gravity',
+    'pcv': 'Packed Cell Volume',
+    'rbcc': 'Red Blood Cell Count',
+    'dm': 'Diabetes Mellitus',
+    'htn': 'Hypertension',
+}
+
+def report_fields(data):
+    """Extract the values a report shows from a /predict result"""
+    form = data['formData']
+    fields = {
+        'formData': {field: form[field] for field in ['sc', 'hemo', 'al', 'sg', 'pcv', 'rbcc', 'dm', 'htn']},
+        'prediction': data['prediction'],
+        'probability': data['probability'],
+        'confidence': data.get('confidence', 'N/A'),
+        'riskFactors': data.get('riskFactors') or [],
+        'modelInfo': "Machine Learning Model" if model is not None else "Rule-based Clinical Assessment",
+    }
+    attributions = data.get('featureContributions')
+    if attributions:
+        contributions = attributions['contributions']
+        fields['featureContributions'] = {
+            'baseline': float(attributions['baseline']),
+            'contributions': {field: float(contributions[field]) for field in FEATURE_LABELS if field in contributions},
+        }
+    return fields
+
+def report_key(fields):
+    """Content hash identifying a rendered report"""
+    canonical = json.dumps(fields, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def render_report(fields, generated_at):
+    """Render a PDF report for the given report_fields() and return its bytes"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    
+    blocks = get_report_blocks()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=1*inch)
+    styles = blocks['styles']
+    form = fields['formData']
+    
+    # Build PDF content
+    story = []
+    
+    # Title
+    story.append(_shared(blocks['title']))
+    story.append(Spacer(1, 20))
+    
+    # Date and time
+    story.append(Paragraph(f"<b>Generated:</b> {generated_at.strftime('%B %d, %Y at %I:%M %p')}", styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Patient Data Section
+    story.append(_shared(blocks['headings']["PATIENT DATA"]))
+    
+    patient_data = [
+        ['Parameter', 'Value', 'Normal Range'],
+        ['Serum Creatinine', f"{form['sc']} mg/dL", '0.6 - 1.3 mg/dL'],
+        ['Hemoglobin', f"{form['hemo']} g/dL", '12.0 - 17.0 g/dL'],
+        ['Albumin Level', form['al'], '0 (Normal)'],
+        ['Specific Gravity', form['sg'], '1.010 - 1.025'],
+        ['Packed Cell Volume', f"{form['pcv']}%", '36 - 48%'],
+        ['Red Blood Cell Count', f"{form['rbcc']} millions/μL", '4.2 - 5.4 millions/μL'],
+        ['Diabetes Mellitus', 'Yes' if str(form['dm']) == '1' else 'No', 'No'],
+        ['Hypertension', 'Yes' if str(form['htn']) == '1' else 'No', 'No']
+    ]
+    
+    patient_table = Table(patient_data, colWidths=blocks['patient_table_col_widths'])
+    patient_table.setStyle(blocks['patient_table_style'])
+    
+    story.append(patient_table)
+    story.append(Spacer(1, 20))
+    
+    # Prediction Results Section
+    story.append(_shared(blocks['headings']["PREDICTION RESULTS"]))
+    
+    # Risk assessment with color coding
+    prediction = fields['prediction']
+    risk_color = colors.red if prediction == 'High Risk' else colors.orange if 'Moderate' in prediction else colors.green
+    story.append(Paragraph(f"<b>Risk Assessment:</b> <font color='{risk_color.hexval()}'>{prediction}</font>", styles['Normal']))
+    story.append(Paragraph(f"<b>Probability:</b> {fields['probability']:.1f}%", styles['Normal']))
+    story.append(Paragraph(f"<b>Confidence:</b> {fields['confidence']}", styles['Normal']))
+    story.append(Spacer(1, 12))
+    
+    # Risk factors
+    if fields['riskFactors']:
+        story.append(_shared(blocks['risk_factors_header']))
+        for factor in fields['riskFactors']:
+            story.append(Paragraph(f"• {factor}", styles['Normal']))
+    else:
+        story.append(_shared(blocks['no_risk_factors']))
+    
+    story.append(Spacer(1, 20))
+    
+    # Model explanation: each feature's contribution, largest first
+    if fields.get('featureContributions'):
+        attributions = fields['featureContributions']
+        story.append(_shared(blocks['headings']["MODEL EXPLANATION"]))
+        story.append(Paragraph(
+            f"Starting from the average risk of {attributions['baseline']:.1f}%, each value moved "
+            f"this prediction by the amount shown (percentage points).", styles['Normal']))
+        story.append(Spacer(1, 8))
+        ranked = sorted(attributions['contributions'].items(), key=lambda item: -abs(item[1]))
+        contribution_data = [['Parameter', 'Value', 'Effect on Risk']] + [
+            [FEATURE_LABELS[field],
+             ('Yes' if str(form[field]) == '1' else 'No') if field in ('dm', 'htn') else str(form[field]),
+             f"{value:+.1f} pts"]
+            for field, value in ranked]
+        contribution_table = Table(contribution_data, colWidths=blocks['patient_table_col_widths'])
+        contribution_table.setStyle(blocks['patient_table_style'])
+        story.append(contribution_table)
+        story.append(Spacer(1, 20))
+    
+    story.append(Spacer(1, 10))
+    
+    # Model information
+    story.append(Paragraph(f"<b>Analysis Method:</b> {fields['modelInfo']}", styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Disclaimer
+    story.append(_shared(blocks['headings']["IMPORTANT DISCLAIMER"]))
+    story.append(_shared(blocks['disclaimer']))
+    
+    # Build PDF
+    doc.build(story)
+    return buffer.getvalue()
+
+# Rendered reports, keyed on a hash of the report content (disable with REPORT_CACHE_SIZE=0)
+report_cache = ResultCache(REPORT_CACHE_SIZE, REPORT_CACHE_TTL) if REPORT_CACHE_SIZE > 0 else None
+
+# Disk cache writes by this process since its last prune of REPORT_CACHE_DIR
+REPORT_CACHE_PRUNE_EVERY = 32
+report_disk_writes = 0
+
+def load_cached_report(key):
+    """Return cached PDF bytes from memory or REPORT_CACHE_DIR, or None"""
+    if report_cache is not None:
+        pdf = report_cache.get(key, model_version)
+        if pdf is not None:
+            return pdf
+    
+    disk_path = os.path.join(REPORT_CACHE_DIR, f'{key}.pdf') if REPORT_CACHE_DIR else None
+    if not disk_path:
+        return None
+    try:
+        if time.time() - os.path.getmtime(disk_path) > REPORT_CACHE_TTL:
+            os.unlink(disk_path)  # Expired: drop it and render afresh
+            return None
+        with open(disk_path, 'rb') as f:
+            pdf = f.read()
+    except OSError:
+        return None  # Missing, or pruned by another worker in the meantime
+    if report_cache is not None:
+        report_cache.put(key, model_version, pdf)
+    return pdf
+
+def prune_report_dir():
+    """Delete expired PDFs from REPORT_CACHE_DIR, then the oldest ones until it is under its caps"""
+    now = time.time()
+    entries = []
+    try:
+        with os.scandir(REPORT_CACHE_DIR) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if now - stat.st_mtime > REPORT_CACHE_TTL:
+                    # Expired reports, and temp files left by a worker that died mid-write
+                    with contextlib.suppress(OSError):
+                        os.unlink(entry.path)
+                elif entry.name.endswith('.pdf'):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return
+
+    entries.sort()
+    total_bytes = sum(size for _, size, _ in entries)
+    max_bytes = REPORT_CACHE_DIR_MAX_MB * 1024 * 1024
+    remaining = len(entries)
+    for _, size, path in entries:
+        if remaining <= REPORT_CACHE_DIR_MAX_FILES and total_bytes <= max_bytes:
+            break
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+        remaining -= 1
+        total_bytes -= size
+
+def store_report(key, pdf):
+    """Add a freshly rendered PDF to the memory and disk caches"""
+    global report_disk_writes
+    if REPORT_CACHE_DIR:
+        # Write atomically so concurrent workers never read a partial file
+        disk_path = os.path.join(REPORT_CACHE_DIR, f'{key}.pdf')
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        tmp_path = f'{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf)
+        os.replace(tmp_path, disk_path)
+
+        # Scanning the directory costs far more than one write, so prune periodically
+        report_disk_writes += 1
+        if report_disk_writes >= REPORT_CACHE_PRUNE_EVERY:
+            report_disk_writes = 0
+            prune_report_dir()
+    if report_cache is not None:
+        report_cache.put(key, model_version, pdf)
+
+def get_report_pdf(data):
+    """Return PDF bytes for a /predict result, serving repeats from memory or REPORT_CACHE_DIR"""
+    fields = report_fields(data)
+    key = report_key(fields)
+    pdf = load_cached_report(key)
+    if pdf is None:
+        pdf = render_report(fields, datetime.now())
+        store_report(key, pdf)
+    return pdf
+
+@app.route('/download_report', methods=['POST'])
+def download_report():
+    """Generate and download PDF report"""
+    start = t = time.perf_counter()
+    try:
+        # Get prediction data from request
+        data = request.get_json()
+        t = metrics.stage('download_report', 'parse', t)
         
-        # Build PDF
-        doc.build(story)
+        # Render the PDF, or reuse an identical earlier render
+        pdf = get_report_pdf(data)
+        t = metrics.stage('download_report', 'render', t)
         
         # Return PDF
-        buffer.seek(0)
-        return send_file(
-            buffer,
+        current_time = datetime.now()
+        response = send_file(
+            io.BytesIO(pdf),
             mimetype='application/pdf',
             as_attachment=True,
             download_name=f'CKD_Report_{current_time.strftime("%Y%m%d_%H%M%S")}.pdf'
         )
+        metrics.stage('download_report', 'serialize', t)
+        metrics.stage('download_report', 'total', start)
+        return response
         
     except Exception as e:
         print(f"PDF generation error: {e}")
+        metrics.inc('ckd_errors_total', help='Failed requests, by endpoint and kind', endpoint='download_report', kind='exception')
         return jsonify({
             'error': f'Failed to generate report: {str(e)}',
             'success': False
         }), 500
 
+class ReportJob:
+    """A batch of report renders submitted together, tracked on disk under REPORT_JOB_DIR
+
+    The worker that accepts the job renders it in its process pool and writes
+    each finished report to the job directory as NNNN.pdf (or NNNN.error), so
+    status and download requests can be served by any worker process. If that
+    worker exits first, its unfinished reports are marked failed by whichever
+    worker next reads the job.
+    """
+
+    def __init__(self, job_id, total, created, owner=None):
+        self.id = job_id
+        self.total = total
+        self.created = created
+        self.owner = owner or {}  # Host and pid of the worker rendering the job
+        self.path = os.path.join(REPORT_JOB_DIR, job_id)
+
+    @classmethod
+    def create(cls, total):
+        """Make the job directory; the manifest is written last, so only complete jobs are visible"""
+        job = cls(uuid.uuid4().hex, total, time.time(), {'host': socket.gethostname(), 'pid': os.getpid()})
+        os.makedirs(job.path)
+        job._write('job.json', json.dumps({'total': total, 'created': job.created, 'owner': job.owner}).encode())
+        return job
+
+    @classmethod
+    def open(cls, job_id):
+        """Return a job created by any worker, or None if it is unknown or expired"""
+        if not (len(job_id) == 32 and all(c in '0123456789abcdef' for c in job_id)):
+            return None
+        try:
+            with open(os.path.join(REPORT_JOB_DIR, job_id, 'job.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - manifest['created'] > REPORT_JOB_TTL:
+            return None
+        return cls(job_id, manifest['total'], manifest['created'], manifest.get('owner'))
+
+    def owner_alive(self):
+        """False once the rendering worker has exited; owners on other hosts are assumed alive"""
+        if self.owner.get('host') != socket.gethostname() or self.owner.get('pid') == os.getpid():
+            return True
+        try:
+            os.kill(self.owner['pid'], 0)
+        except ProcessLookupError:
+            return False
+        except (OSError, KeyError, TypeError):
+            return True
+        return True
+
+    def _fail_if_orphaned(self, finished):
+        # Record unfinished reports of a job whose worker has exited as failed, so every
+        # reader sees a finished job instead of one that stays running forever
+        if len(finished) == self.total or self.owner_alive():
+            return finished
+        for i in range(self.total):
+            if i not in finished:
+                self.store(i, error="Report worker exited before rendering this report")
+                finished[i] = 'error'
+        return finished
+
+    def _write(self, name, data):
+        # Write atomically so readers in other workers never see a partial file
+        tmp_path = os.path.join(self.path, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.path, name))
+
+    def store(self, i, pdf=None, error=None):
+        """Record report i as rendered, or as failed with an error message"""
+        if error is None:
+            self._write(f'{i:04d}.pdf', pdf)
+        else:
+            self._write(f'{i:04d}.error', str(error).encode())
+
+    def finished(self):
+        """Map of report index to 'pdf' or 'error' for every finished report"""
+        finished = {}
+        for name in os.listdir(self.path):
+            stem, _, kind = name.partition('.')
+            if kind in ('pdf', 'error') and stem.isdigit():
+                finished[int(stem)] = kind
+        return finished
+
+    def result(self, i):
+        """PDF bytes of finished report i; raises RuntimeError if it failed"""
+        error_path = os.path.join(self.path, f'{i:04d}.error')
+        if os.path.exists(error_path):
+            with open(error_path) as f:
+                raise RuntimeError(f.read())
+        with open(os.path.join(self.path, f'{i:04d}.pdf'), 'rb') as f:
+            return f.read()
+
+    def as_completed(self, poll_interval=0.05, orphan_check_interval=1.0):
+        """Yield report indexes as they finish
+
+        Stops with TimeoutError when no report has finished for
+        REPORT_JOB_STALL_TIMEOUT seconds, or the job expires. Reports left
+        unfinished by a worker that exited are yielded as failed.
+        """
+        seen = set()
+        last_progress = last_orphan_check = time.time()
+        while len(seen) < self.total:
+            finished = self.finished()
+            now = time.time()
+            if now - last_orphan_check >= orphan_check_interval:
+                finished = self._fail_if_orphaned(finished)
+                last_orphan_check = now
+            new = sorted(set(finished) - seen)
+            if not new:
+                if now - self.created > REPORT_JOB_TTL:
+                    raise TimeoutError("Report job expired before all reports finished")
+                if now - last_progress > REPORT_JOB_STALL_TIMEOUT:
+                    raise TimeoutError(f"No report finished in {REPORT_JOB_STALL_TIMEOUT:.0f}s; giving up")
+                time.sleep(poll_interval)
+                continue
+            last_progress = now
+            seen.update(new)
+            yield from new
+
+    def status(self):
+        """Progress summary for the status endpoint"""
+        finished = self._fail_if_orphaned(self.finished())
+        failed = sorted(i for i, kind in finished.items() if kind == 'error')
+        if len(finished) < self.total:
+            state = 'running' if finished else 'pending'
+        else:
+            state = 'failed' if len(failed) == self.total else 'done'
+        errors = []
+        for i in failed:
+            try:
+                self.result(i)
+            except RuntimeError as e:
+                errors.append({'index': i, 'error': str(e)})
+        return {
+            'job_id': self.id,
+            'status': state,
+            'total': self.total,
+            'completed': len(finished) - len(failed),
+            'failed': len(failed),
+            'errors': errors,
+        }
+
+class _ChunkWriter(io.RawIOBase):
+    """Write-only, unseekable stream that hands written bytes back in chunks"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+report_jobs_lock = threading.Lock()
+report_pool = None
+report_pool_pid = None
+
+def get_report_pool():
+    """Process pool for background report rendering, created lazily in each worker process"""
+    global report_pool, report_pool_pid
+    with report_jobs_lock:
+        if report_pool is None or report_pool_pid != os.getpid():
+            report_pool = ProcessPoolExecutor(max_workers=REPORT_JOB_WORKERS)
+            report_pool_pid = os.getpid()
+        return report_pool
+
+def _store_rendered_report(job, i, key):
+    # Record a finished background render in the job directory and the report cache
+    def callback(future):
+        if future.exception() is not None:
+            job.store(i, error=future.exception())
+            return
+        job.store(i, pdf=future.result())
+        if report_cache is not None:
+            report_cache.put(key, model_version, future.result())
+    return callback
+
+def prune_report_jobs():
+    """Delete job directories older than REPORT_JOB_TTL"""
+    try:
+        names = os.listdir(REPORT_JOB_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(REPORT_JOB_DIR, name)
+        try:
+            if time.time() - os.path.getmtime(path) > REPORT_JOB_TTL:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            continue
+
+def submit_report_job(payloads):
+    """Queue report renders for a list of /predict results and return the ReportJob"""
+    fields_list = [report_fields(data) for data in payloads]
+    prune_report_jobs()
+    job = ReportJob.create(len(fields_list))
+    pool = None
+    for i, fields in enumerate(fields_list):
+        key = report_key(fields)
+        pdf = report_cache.get(key, model_version) if report_cache is not None else None
+        if pdf is not None:
+            job.store(i, pdf=pdf)
+        else:
+            pool = pool or get_report_pool()
+            future = pool.submit(render_report, fields, datetime.now())
+            future.add_done_callback(_store_rendered_report(job, i, key))
+    return job
+
+def stream_report_zip(job):
+    """Yield a ZIP of the job's PDFs, adding each report as soon as it finishes"""
+    writer = _ChunkWriter()
+    errors = []
+    with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        try:
+            for i in job.as_completed():
+                try:
+                    archive.writestr(f"report_{i + 1:04d}.pdf", job.result(i))
+                except RuntimeError as e:
+                    errors.append(f"report_{i + 1:04d}: {e}")
+                    continue
+                yield writer.take()
+        except TimeoutError as e:
+            errors.append(str(e))
+        if errors:
+            archive.writestr("errors.txt", "\n".join(sorted(errors)) + "\n")
+    yield writer.take()
+
+@app.route('/report_jobs', methods=['POST'])
+def create_report_job():
+    """Queue one report, or a list of reports, for background rendering"""
+    try:
+        payload = request.get_json(silent=True)
+        payloads = payload if isinstance(payload, list) else [payload]
+        if not payloads or not all(isinstance(p, dict) for p in payloads):
+            return jsonify({
+                'error': 'Expected a /predict result or a JSON list of them',
+                'success': False
+            }), 400
+        if len(payloads) > MAX_BATCH_SIZE:
+            return jsonify({
+                'error': f'Too many reports: {len(payloads)} (maximum {MAX_BATCH_SIZE})',
+                'success': False
+            }), 413
+
+        for i, data in enumerate(payloads):
+            try:
+                report_fields(data)
+            except KeyError as e:
+                return jsonify({
+                    'error': f'Report {i}: missing field {e}',
+                    'success': False
+                }), 400
+
+        job = submit_report_job(payloads)
+        return jsonify({**job.status(), 'success': True}), 202
+
+    except Exception as e:
+        print(f"Report job error: {e}")
+        return jsonify({
+            'error': f'Failed to queue reports: {str(e)}',
+            'success': False
+        }), 500
+
+@app.route('/report_jobs/<job_id>')
+def report_job_status(job_id):
+    """Report progress of a background report job"""
+    job = ReportJob.open(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown report job', 'success': False}), 404
+    return jsonify({**job.status(), 'success': True})
+
+@app.route('/report_jobs/<job_id>/download')
+def download_report_job(job_id):
+    """Return the job's PDF, or stream a ZIP of all its PDFs as they finish"""
+    job = ReportJob.open(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown report job', 'success': False}), 404
+
+    current_time = datetime.now()
+    if job.total == 1:
+        try:
+            for i in job.as_completed():
+                pdf = job.result(i)
+        except Exception as e:
+            print(f"PDF generation error: {e}")
+            return jsonify({
+                'error': f'Failed to generate report: {str(e)}',
+                'success': False
+            }), 500
+        return send_file(
+            io.BytesIO(pdf),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=f'CKD_Report_{current_time.strftime("%Y%m%d_%H%M%S")}.pdf'
+        )
+
+    return Response(
+        stream_with_context(stream_report_zip(job)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename=CKD_Reports_{current_time.strftime("%Y%m%d_%H%M%S")}.zip'}
+    )
+
+@app.route('/report_cache_stats')
+def report_cache_stats():
+    """Report rendered PDF cache size and hit/miss/eviction counters"""
+    if report_cache is None:
+        return jsonify({'enabled': False, 'success': True})
+    return jsonify({'enabled': True, **report_cache.stats(), 'success': True})
+
+@app.before_request
+def start_model_poller():
+    """Make sure this worker polls the model registry"""
+    if model_registry is not None:
+        model_registry.ensure_poller()
+
+def admin_denied():
+    """Return an error response unless the request carries ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin actions are disabled; set ADMIN_TOKEN to enable them', 'success': False}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Invalid admin token', 'success': False}), 403
+    return None
+
+@app.route('/admin/model')
+def admin_model():
+    """Show the active model version and the registry state"""
+    if model_registry is None:
+        return jsonify({'enabled': False, 'model_version': model_version, 'success': True})
+    return jsonify({'enabled': True, **model_registry.status(), 'success': True})
+
+@app.route('/admin/model/rollback', methods=['POST'])
+def admin_model_rollback():
+    """Pin every worker to a version: the one given as {"version": ...}, or the previous one"""
+    denied = admin_denied()
+    if denied is not None:
+        return denied
+    if model_registry is None:
+        return jsonify({'error': 'Model registry is disabled; set MODEL_REGISTRY_DIR', 'success': False}), 400
+    payload = request.get_json(silent=True) or {}
+    try:
+        name = model_registry.rollback(payload.get('version'))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'success': False}), 409
+    return jsonify({'active': name, 'model_version': model_version, 'success': True})
+
+@app.route('/admin/model/latest', methods=['POST'])
+def admin_model_latest():
+    """Remove the pin, so every worker follows the newest valid version again"""
+    denied = admin_denied()
+    if denied is not None:
+        return denied
+    if model_registry is None:
+        return jsonify({'error': 'Model registry is disabled; set MODEL_REGISTRY_DIR', 'success': False}), 400
+    model_registry.pin(None)
+    model_registry.poll()
+    return jsonify({'active': model_registry.active, 'model_version': model_version,
+                    'last_error': model_registry.last_error, 'success': True})
+
+def metrics_text():
+    """Per-stage latency histograms, counters and cache gauges in Prometheus text format"""
+    extra = []
+    for name, cache in [('prediction', prediction_cache), ('report', report_cache)]:
+        if cache is not None:
+            stats = cache.stats()
+            extra.append((f'ckd_{name}_cache_entries', 'gauge', f'Entries in the {name} cache', [({}, stats['size'])]))
+            extra.append((f'ckd_{name}_cache_lookups_total', 'counter', f'{name.capitalize()} cache lookups, by result',
+                          [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])]))
+    if microbatcher is not None:
+        extra.append(('ckd_microbatch_queue_depth', 'gauge', 'Rows waiting for the micro-batcher',
+                      [({}, microbatcher.stats()['queue_depth'])]))
+    extra.append(('ckd_model_info', 'gauge', 'Active model version', [({'version': model_version}, 1)]))
+    return metrics.render(extra)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Serve metrics_text() for Prometheus"""
+    return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
+
+def warm_up():
+    """Run a dummy prediction and a dummy report so the first real requests are fast
+
+    Imports ReportLab, builds the shared report blocks and touches the model's
+    arrays. Caches and the micro-batcher are bypassed, so no results are stored
+    and no threads or processes are started. gunicorn.conf.py calls this once in
+    the master with --preload, or in each worker otherwise.
+    """
+    start = time.perf_counter()
+    sample = {'sc': '1.2', 'hemo': '15.4', 'al': '1', 'sg': '1.020', 'pcv': '44', 'rbcc': '5.2', 'dm': '0', 'htn': '0'}
+    input_data, _ = validate_record(sample)
+    predict_rows(np.repeat(input_data, 2, axis=0))
+    result = build_result(sample, *scored_row(predict_rows(input_data), 0))
+    render_report(report_fields(result), datetime.now())
+    print(f"Warm-up finished in {(time.perf_counter() - start) * 1000:.0f} ms")
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
@@ -0,0 +1,175 @@
+# Async (ASGI) entry point serving /, /predict and /download_report on an event loop:
+#   pip install -r requirements-async.txt
+#   uvicorn asgi:app --workers 4
+# Connections, slow uploads and slow readers are handled by the event loop. Model
+# inference runs in a bounded thread pool and PDF rendering in the app's report
+# process pool (or the inference threads with ASYNC_REPORT_EXECUTOR=thread, which
+# is cheaper on single-core hosts), so neither blocks other connections. When too much work is already
+# queued, requests get 503 instead of waiting in an unbounded backlog. Everything
+# else (validation, caches, metrics, the model registry, shadow scoring) is shared
+# with the Flask app in app.py.
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from flask import render_template
+from starlette.applications import Starlette
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+import app as ckd
+
+ASYNC_INFERENCE_THREADS = int(os.environ.get('ASYNC_INFERENCE_THREADS', '4'))
+ASYNC_MAX_PENDING = int(os.environ.get('ASYNC_MAX_PENDING', '256'))
+ASYNC_MAX_PENDING_REPORTS = int(os.environ.get('ASYNC_MAX_PENDING_REPORTS', '32'))
+ASYNC_REPORT_EXECUTOR = os.environ.get('ASYNC_REPORT_EXECUTOR', 'process')
+
+inference_pool = None
+inference_slots = None
+report_slots = None
+index_html = None
+
+
+class Busy(Exception):
+    """Raised when a pool already has its maximum amount of queued work"""
+
+
+async def offload(pool, slots, fn, *args):
+    """Run fn(*args) in pool without blocking the event loop, or raise Busy if slots are exhausted"""
+    if slots.locked():
+        raise Busy()
+    async with slots:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+def busy_response():
+    return JSONResponse({'error': 'Server busy, please retry', 'success': False}, status_code=503,
+                        headers={'Retry-After': '1'})
+
+
+def render_flask_template(name, **context):
+    # Templates use Flask's url_for, so render them with the Flask app's Jinja environment
+    with ckd.app.test_request_context():
+        return render_template(name, **context)
+
+
+async def index(request):
+    """Render the main page, pre-rendered at startup since it has no per-request content"""
+    return HTMLResponse(index_html)
+
+
+async def predict(request):
+    """Handle prediction requests - supports both form and JSON data"""
+    start = t = time.perf_counter()
+    is_json = request.headers.get('content-type', '').split(';')[0].strip() == 'application/json'
+    try:
+        # Handle both JSON and form data
+        if is_json:
+            form_data = await request.json()
+        else:
+            form_data = dict(await request.form())
+        t = ckd.metrics.stage('predict', 'parse', t)
+
+        # Validate required fields and preprocess input
+        input_data, error, t = ckd.validate_prediction_request(form_data, t)
+        if error is not None:
+            return JSONResponse({'error': error, 'success': False}, status_code=400)
+
+        # Make prediction off the event loop
+        try:
+            scored = await offload(inference_pool, inference_slots, ckd.predict_one, input_data)
+        except Busy:
+            ckd.metrics.inc('ckd_errors_total', help='Failed requests, by endpoint and kind', endpoint='predict', kind='busy')
+            return busy_response()
+        t = ckd.metrics.stage('predict', 'predict', t)
+
+        result = ckd.prediction_result(form_data, input_data, scored)
+        if not is_json:
+            return HTMLResponse(render_flask_template('result.html', prediction=ckd.prediction_page_text(scored[0])))
+
+        response = JSONResponse(result)
+        ckd.metrics.stage('predict', 'serialize', t)
+        ckd.metrics.stage('predict', 'total', start)
+        return response
+
+    except Exception as e:
+        error_msg = f'An error occurred during prediction: {str(e)}'
+        print(error_msg)
+        ckd.metrics.inc('ckd_errors_total', help='Failed requests, by endpoint and kind', endpoint='predict', kind='exception')
+        if is_json:
+            return JSONResponse({'error': error_msg, 'success': False}, status_code=500)
+        return HTMLResponse(render_flask_template('result.html', prediction="An error occurred. Please try again."))
+
+
+async def download_report(request):
+    """Generate and download PDF report, rendering off the event loop"""
+    start = t = time.perf_counter()
+    try:
+        data = await request.json()
+        fields = ckd.report_fields(data)
+        key = ckd.report_key(fields)
+        t = ckd.metrics.stage('download_report', 'parse', t)
+
+        # Render the PDF, or reuse an identical earlier render. The cache may read, write
+        # and prune REPORT_CACHE_DIR, so it runs on the inference threads like rendering.
+        loop = asyncio.get_running_loop()
+        pdf = await loop.run_in_executor(inference_pool, ckd.load_cached_report, key)
+        if pdf is None:
+            try:
+                pool = ckd.get_report_pool() if ASYNC_REPORT_EXECUTOR == 'process' else inference_pool
+                pdf = await offload(pool, report_slots, ckd.render_report, fields, datetime.now())
+            except Busy:
+                ckd.metrics.inc('ckd_errors_total', help='Failed requests, by endpoint and kind',
+                                endpoint='download_report', kind='busy')
+                return busy_response()
+            await loop.run_in_executor(inference_pool, ckd.store_report, key, pdf)
+        t = ckd.metrics.stage('download_report', 'render', t)
+
+        current_time = datetime.now()
+        response = Response(pdf, media_type='application/pdf', headers={
+            'Content-Disposition': f'attachment; filename=CKD_Report_{current_time.strftime("%Y%m%d_%H%M%S")}.pdf'})
+        ckd.metrics.stage('download_report', 'serialize', t)
+        ckd.metrics.stage('download_report', 'total', start)
+        return response
+
+    except Exception as e:
+        print(f"PDF generation error: {e}")
+        ckd.metrics.inc('ckd_errors_total', help='Failed requests, by endpoint and kind', endpoint='download_report', kind='exception')
+        return JSONResponse({'error': f'Failed to generate report: {str(e)}', 'success': False}, status_code=500)
+
+
+async def metrics(request):
+    """Per-stage latency histograms, counters and cache gauges in Prometheus text format"""
+    return PlainTextResponse(ckd.metrics_text(), media_type='text/plain; version=0.0.4')
+
+
+@asynccontextmanager
+async def lifespan(_):
+    # Per-worker startup: warm the model and ReportLab, pre-render the index page, create the pools
+    global inference_pool, inference_slots, report_slots, index_html
+    ckd.warm_up()
+    index_html = render_flask_template('index.html')
+    inference_pool = ThreadPoolExecutor(max_workers=ASYNC_INFERENCE_THREADS, thread_name_prefix='inference')
+    inference_slots = asyncio.Semaphore(ASYNC_MAX_PENDING)
+    report_slots = asyncio.Semaphore(ASYNC_MAX_PENDING_REPORTS)
+    if ckd.model_registry is not None:
+        ckd.model_registry.ensure_poller()
+    yield
+    inference_pool.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/predict', predict, methods=['POST']),
+        Route('/download_report', download_report, methods=['POST']),
+        Route('/metrics', metrics),
+        Mount('/static', StaticFiles(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')),
+              name='static'),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,161 @@
+# Load test: the Flask app under gunicorn sync workers vs. the ASGI app (asgi.py) under uvicorn
+# Run from the repository root: python -m benchmarks.bench_async [--workers N] [--duration S]
+# Both servers get the same worker count, with result caches off so every request does real work.
+# Scenarios:
+#   predict      closed-loop /predict clients at increasing connection counts
+#   slow_upload  slow clients trickling their request bodies while fast clients keep calling /predict
+#   reports      concurrent uncached /download_report renders
+import argparse                    # For command-line options
+import asyncio                     # For many concurrent client connections
+import json                        # For request bodies and the results file
+import os                          # For the server environment
+import socket                      # For waiting until a server listens
+import statistics                  # For latency percentiles
+import subprocess                  # For starting the servers
+import sys                         # For the interpreter path
+import time                        # For wall-clock measurements
+
+from benchmarks.bench_reports import make_payload
+from benchmarks.run import sample_records
+
+HOST = '127.0.0.1'
+SERVERS = {
+    'flask-gunicorn-sync': lambda port, workers: [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                                  '-w', str(workers), '-b', f'{HOST}:{port}', 'app:app'],
+    'asgi-uvicorn': lambda port, workers: [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', HOST,
+                                           '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+}
+
+
+async def http_request(port, path, body, timeout, slow_seconds=0.0):
+    # One POST on a fresh connection; returns the status code, or None on timeout/connection error
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(HOST, port), timeout)
+        writer.write((f'POST {path} HTTP/1.1\r\nHost: {HOST}\r\nContent-Type: application/json\r\n'
+                      f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n').encode())
+        if slow_seconds:
+            # Trickle the body in ten pieces, like a client on a poor connection
+            step = max(1, len(body) // 10)
+            for start in range(0, len(body), step):
+                writer.write(body[start:start + step])
+                await writer.drain()
+                await asyncio.sleep(slow_seconds / 10)
+        else:
+            writer.write(body)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+        writer.close()
+        return int(response.split(b' ', 2)[1])
+    except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+        return None
+
+
+async def closed_loop(port, path, bodies, connections, duration, timeout):
+    # connections clients each send requests back to back for duration seconds
+    latencies, statuses = [], []
+    deadline = time.perf_counter() + duration
+
+    async def client(i):
+        n = i
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = await http_request(port, path, bodies[n % len(bodies)], timeout)
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status)
+            n += connections
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(connections)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+async def slow_upload(port, bodies, slow_clients, fast_clients, duration, timeout, slow_seconds):
+    # Keep slow_clients connections busy uploading while fast_clients measure /predict
+    stop = time.perf_counter() + duration
+
+    async def slow(i):
+        while time.perf_counter() < stop:
+            await http_request(port, '/predict', bodies[i % len(bodies)], timeout, slow_seconds)
+
+    slow_tasks = [asyncio.create_task(slow(i)) for i in range(slow_clients)]
+    await asyncio.sleep(0.2)  # Let the slow uploads occupy the server first
+    result = await closed_loop(port, '/predict', bodies, fast_clients, duration - 0.2, timeout)
+    await asyncio.gather(*slow_tasks)
+    return result
+
+
+def summarize(latencies, statuses, elapsed):
+    ok = sorted(latency for latency, status in zip(latencies, statuses) if status == 200)
+    if not ok:
+        return {'requests': len(statuses), 'ok': 0, 'errors': len(statuses), 'rps': 0.0,
+                'p50_ms': None, 'p99_ms': None}
+    return {
+        'requests': len(statuses),
+        'ok': len(ok),
+        'errors': len(statuses) - len(ok),
+        'rps': len(ok) / elapsed,
+        'p50_ms': statistics.median(ok) * 1000,
+        'p99_ms': ok[min(len(ok) - 1, int(len(ok) * 0.99))] * 1000,
+    }
+
+
+def wait_for_port(port, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def bench_server(name, port, args):
+    env = dict(os.environ, PREDICTION_CACHE_SIZE='0', REPORT_CACHE_SIZE='0', PYTHONWARNINGS='ignore')
+    server = subprocess.Popen(SERVERS[name](port, args.workers), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        time.sleep(1.0)  # Let every worker finish warming up
+        predict_bodies = [json.dumps(record).encode() for record in sample_records(1000, seed=5)]
+        report_bodies = [json.dumps(make_payload(i)).encode() for i in range(200)]
+        results = {}
+        for connections in args.connections:
+            results[f'predict_c{connections}'] = asyncio.run(closed_loop(
+                port, '/predict', predict_bodies, connections, args.duration, args.timeout))
+        results['slow_upload'] = asyncio.run(slow_upload(
+            port, predict_bodies, args.slow_clients, 8, args.duration, args.timeout, args.slow_seconds))
+        results['reports_c16'] = asyncio.run(closed_loop(
+            port, '/download_report', report_bodies, 16, args.duration, args.timeout))
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the sync Flask and ASGI deployments side by side.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes per server")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per scenario")
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 16, 64, 256], help="Concurrent /predict clients")
+    parser.add_argument('--slow-clients', type=int, default=32, help="Slow uploaders in the slow_upload scenario")
+    parser.add_argument('--slow-seconds', type=float, default=2.0, help="Time each slow client takes to send its body")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Per-request timeout; timeouts count as errors")
+    parser.add_argument('--output', default=None, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for port, name in enumerate(SERVERS, start=18760):
+        print(f"Benchmarking {name} with {args.workers} worker(s)...", file=sys.stderr)
+        results[name] = bench_server(name, port, args)
+
+    print(f"{'scenario':<14} {'server':<22} {'ok/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'errors':>7}")
+    for scenario in next(iter(results.values())):
+        for name, server_results in results.items():
+            r = server_results[scenario]
+            p50 = f"{r['p50_ms']:.1f}" if r['p50_ms'] is not None else '-'
+            p99 = f"{r['p99_ms']:.1f}" if r['p99_ms'] is not None else '-'
+            print(f"{scenario:<14} {name:<22} {r['rps']:>8.1f} {p50:>8} {p99:>9} {r['errors']:>7}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'workers': args.workers, 'duration': args.duration, 'results': results}, f, indent=2)
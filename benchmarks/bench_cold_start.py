@@ -0,0 +1,68 @@
+# Cold-start budget check for the web app
+# Run from the repository root: python -m benchmarks.bench_cold_start [--budget-ms N]
+# Exits with status 1 when the median import time of app.py exceeds the budget.
+import argparse                    # For command-line options
+import os                          # For the budget environment variable
+import statistics                  # For medians
+import subprocess                  # For fresh interpreter processes
+import sys                         # For the interpreter path and exit status
+
+# Imports ReportLab and the model arrays on the first report, so it is measured separately
+FIRST_REQUEST = r'''
+import time, warnings
+warnings.filterwarnings('ignore')
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+result = client.post('/predict', json={'sc': '1.2', 'hemo': '15.4', 'al': '1', 'sg': '1.020',
+                                       'pcv': '44', 'rbcc': '5.2', 'dm': '0', 'htn': '0'}).get_json()
+predicted = time.perf_counter()
+client.post('/download_report', json=result)
+reported = time.perf_counter()
+print(imported - start, predicted - imported, reported - predicted)
+'''
+
+def import_profile():
+    # Per-module cumulative import times (microseconds) for a fresh `import app`
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            capture_output=True, text=True, check=True).stderr
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Keep app itself and the modules it imports directly (two spaces of indentation per level)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+def measure(runs):
+    # Median import, first-predict and first-report times over fresh processes
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', FIRST_REQUEST], capture_output=True, text=True, check=True)
+        timings.append([float(value) for value in output.stdout.split()[-3:]])
+    return [statistics.median(column) * 1000 for column in zip(*timings)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app.py cold start and enforce an import-time budget.")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh processes to measure")
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('COLD_START_BUDGET_MS', '600')),
+                        help="Maximum median import time of app.py (default: $COLD_START_BUDGET_MS or 600)")
+    args = parser.parse_args()
+
+    profile = import_profile()
+    print("Slowest direct imports of app.py:")
+    for name, micros in sorted(profile.items(), key=lambda item: -item[1])[:8]:
+        print(f"  {name:<32} {micros / 1000:8.1f} ms")
+
+    import_ms, predict_ms, report_ms = measure(args.runs)
+    print(f"Median over {args.runs} runs: import {import_ms:.0f} ms, first /predict {predict_ms:.1f} ms, "
+          f"first /download_report {report_ms:.0f} ms")
+
+    if import_ms > args.budget_ms:
+        print(f"FAIL: import time {import_ms:.0f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    print(f"OK: import time within budget of {args.budget_ms:.0f} ms")
@@ -0,0 +1,65 @@
+# Model load time and per-worker memory: pickle vs memory-mapped artifact
+# Run from the repository root: python -m benchmarks.bench_model_load
+import json                        # For passing results from worker processes
+import subprocess                  # For starting independent worker processes
+import sys                         # For the interpreter path
+import time                        # For wall-clock measurements
+
+N_WORKERS = 4
+
+# Each worker imports numpy, loads the model one way, scores the bundled dataset so
+# every page is touched, waits until all workers are alive, then reports its memory
+WORKER = r'''
+import json, sys, time, warnings
+warnings.filterwarnings('ignore')
+import numpy as np
+sys.path.insert(0, 'src')
+mode, ready_at = sys.argv[1], float(sys.argv[2])
+
+def memory():
+    fields = {}
+    for path in ('/proc/self/status', '/proc/self/smaps_rollup'):
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'RssAnon', 'RssFile', 'Pss'):
+                    fields[key] = int(value.split()[0])
+    return fields
+
+before = memory()
+start = time.perf_counter()
+if mode == 'pickle':
+    import joblib
+    model = joblib.load('final/ckd_model.pkl')
+else:
+    from forest import FlatForest
+    model = FlatForest.load_mmap('final/ckd_forest')
+load_time = time.perf_counter() - start
+
+X = np.loadtxt('preprocessed_final_ckd.csv', delimiter=',', skiprows=1, usecols=range(8))
+start = time.perf_counter()
+model.predict_proba(X[:1])
+first_predict = time.perf_counter() - start
+model.predict_proba(X)
+
+time.sleep(max(0.0, ready_at - time.time()))
+after = memory()
+print(json.dumps({'load_ms': load_time * 1000, 'first_predict_ms': first_predict * 1000,
+                  **{key: after[key] - before.get(key, 0) for key in after}}))
+'''
+
+def run(mode):
+    # Start all workers together so shared pages are split between them in Pss
+    ready_at = time.time() + 5.0
+    procs = [subprocess.Popen([sys.executable, '-c', WORKER, mode, str(ready_at)], stdout=subprocess.PIPE, text=True)
+             for _ in range(N_WORKERS)]
+    results = [json.loads(proc.communicate()[0]) for proc in procs]
+    mean = {key: sum(r[key] for r in results) / len(results) for key in results[0]}
+    print(f"{mode:<7} load {mean['load_ms']:7.1f} ms  first predict {mean['first_predict_ms']:6.2f} ms  "
+          f"per worker: RSS +{mean['VmRSS'] / 1024:5.1f} MiB (anon +{mean['RssAnon'] / 1024:5.1f}, "
+          f"file +{mean['RssFile'] / 1024:5.1f})  PSS +{mean['Pss'] / 1024:5.1f} MiB")
+
+if __name__ == "__main__":
+    print(f"{N_WORKERS} concurrent workers, deltas measured after importing numpy")
+    run('pickle')
+    run('mmap')
@@ -0,0 +1,31 @@
+# Report rendering throughput benchmark
+# Run from the repository root: python -m benchmarks.bench_reports
+import time                        # For wall-clock measurements
+import app                         # The Flask application under test
+
+def make_payload(i):
+    # A /predict-style result; i varies the values so every payload is distinct
+    return {
+        'prediction': 'High Risk' if i % 2 else 'Low Risk',
+        'probability': 10.0 + (i % 80),
+        'riskFactors': ['Elevated Serum Creatinine', 'Proteinuria (1+)'] if i % 2 else [],
+        'confidence': 'High',
+        'formData': {'sc': f'{1 + i / 1000:.3f}', 'hemo': '13.1', 'al': '1', 'sg': '1.020',
+                     'pcv': '41', 'rbcc': '4.8', 'dm': '1', 'htn': '0'},
+        'success': True,
+    }
+
+def bench(label, payloads):
+    # Post every payload to /download_report and report reports/sec
+    client = app.app.test_client()
+    start = time.perf_counter()
+    for payload in payloads:
+        response = client.post('/download_report', json=payload)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(payloads) / elapsed:8.1f} reports/sec ({elapsed * 1000 / len(payloads):.2f} ms each)")
+
+if __name__ == "__main__":
+    n = 200
+    bench("distinct payloads", [make_payload(i) for i in range(n)])
+    bench("repeated payload", [make_payload(0)] * n)
@@ -0,0 +1,245 @@
+# Benchmark suite for the serving and training hot paths
+# Run from the repository root:
+#   python -m benchmarks.run                          # write benchmarks/results.json
+#   python -m benchmarks.run --save-baseline          # also store it as benchmarks/baseline.json
+#   python -m benchmarks.run --compare                # flag regressions against the baseline
+# Exits with status 1 when --compare finds a regression.
+import argparse                    # For command-line options
+import contextlib                  # For temporarily switching the app's model
+import io                          # For building NPY request bodies
+import json                        # For machine-readable results
+import os                          # For file paths
+import platform                    # For recording where results came from
+import shutil                      # For copying datasets into a scratch directory
+import statistics                  # For medians
+import subprocess                  # For timing the src/ scripts end to end
+import sys                         # For the interpreter path and exit status
+import tempfile                    # For the scratch directory
+import time                        # For wall-clock measurements
+from datetime import datetime      # For result timestamps
+import warnings
+warnings.filterwarnings('ignore')
+
+import numpy as np                 # For building input batches
+import app                         # The Flask application under test
+from benchmarks.bench_reports import make_payload
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'results.json')
+BASELINE_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'baseline.json')
+
+SAMPLE = {'sc': '1.2', 'hemo': '15.4', 'al': '1', 'sg': '1.020', 'pcv': '44', 'rbcc': '5.2', 'dm': '0', 'htn': '0'}
+
+
+def sample_records(n, seed=0):
+    # Valid /predict records with varied values, so caches never hide the real cost
+    rng = np.random.default_rng(seed)
+    return [{
+        'sc': f'{rng.uniform(0.5, 8.0):.2f}', 'hemo': f'{rng.uniform(6.0, 17.0):.1f}',
+        'al': str(rng.integers(0, 6)), 'sg': f'{rng.choice([1.005, 1.010, 1.015, 1.020, 1.025]):.3f}',
+        'pcv': f'{rng.uniform(20, 54):.0f}', 'rbcc': f'{rng.uniform(2.5, 6.5):.1f}',
+        'dm': str(rng.integers(0, 2)), 'htn': str(rng.integers(0, 2)),
+    } for _ in range(n)]
+
+
+def time_per_call(fn, args_list, repeats=5):
+    # Median over repeats of the mean time per call across args_list, in seconds
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for args in args_list:
+            fn(*args)
+        timings.append((time.perf_counter() - start) / len(args_list))
+    return statistics.median(timings)
+
+
+@contextlib.contextmanager
+def serving_mode(path):
+    # Switch the app between the model and the rule-based fallback, with result caches off
+    saved = app.model, app.forest, app.prediction_cache, app.report_cache, app.microbatcher
+    app.prediction_cache = app.report_cache = app.microbatcher = None
+    if path == 'fallback':
+        app.model = app.forest = None
+    try:
+        yield
+    finally:
+        app.model, app.forest, app.prediction_cache, app.report_cache, app.microbatcher = saved
+
+
+def bench_serving(results, path, n_single=200, n_batch=2000):
+    client = app.app.test_client()
+    singles = [(record,) for record in sample_records(n_single, seed=1)]
+    batch = sample_records(n_batch, seed=2)
+    with serving_mode(path):
+        if path == 'model' and app.model is None:
+            return
+        post = lambda record: client.post('/predict', json=record)
+        results[f'predict_single_{path}_ms'] = (time_per_call(post, singles) * 1000, 'ms', 'lower')
+
+        rows = np.vstack([app.validate_record(record)[0] for record, in singles])
+        score = lambda i: app.scored_row(app.predict_rows(rows[i:i + 1]), 0)
+        results[f'predict_rows_single_{path}_ms'] = (
+            time_per_call(score, [(i,) for i in range(len(rows))]) * 1000, 'ms', 'lower')
+
+        post_batch = lambda: client.post('/predict_batch', json=batch)
+        seconds = time_per_call(post_batch, [()], repeats=3)
+        results[f'predict_batch_{path}_rows_per_sec'] = (n_batch / seconds, 'rows/sec', 'higher')
+
+        # Same rows as a float32 NPY body with an NPZ response
+        buffer = io.BytesIO()
+        np.save(buffer, np.array([[float(record[name]) for name in app.FEATURE_NAMES] for record in batch], dtype='<f4'))
+        post_npy = lambda: client.post('/predict_batch', data=buffer.getvalue(), content_type=app.NPY_MIMETYPE,
+                                       headers={'Accept': app.NPZ_MIMETYPE})
+        seconds = time_per_call(post_npy, [()], repeats=3)
+        results[f'predict_batch_npy_{path}_rows_per_sec'] = (n_batch / seconds, 'rows/sec', 'higher')
+
+
+def bench_attributions(results, n_single=200, n_batch=2000):
+    # Tree-path attributions against plain scoring on the flat forest, single rows and one batch
+    if app.forest is None:
+        return
+    rows = np.vstack([app.validate_record(record)[0] for record in sample_records(n_batch, seed=4)])
+    singles = [(row,) for row in rows[:n_single]]
+    app.forest.build_attributions()  # Normally already built when the app loaded the forest
+    results['forest_predict_single_us'] = (time_per_call(app.forest.predict_proba, singles) * 1e6, 'us', 'lower')
+    results['forest_explain_single_us'] = (time_per_call(app.forest.explain, singles) * 1e6, 'us', 'lower')
+    results['forest_predict_batch_ms'] = (time_per_call(app.forest.predict_proba, [(rows,)], repeats=3) * 1000, 'ms', 'lower')
+    results['forest_explain_batch_ms'] = (time_per_call(app.forest.explain, [(rows,)], repeats=3) * 1000, 'ms', 'lower')
+
+
+def bench_reports(results, n=50):
+    # Full render without the report cache, plus the cached path through the endpoint
+    fields = [(app.report_fields(make_payload(i)), datetime.now()) for i in range(n)]
+    app.get_report_blocks()
+    results['render_report_ms'] = (time_per_call(app.render_report, fields, repeats=3) * 1000, 'ms', 'lower')
+
+    client = app.app.test_client()
+    payload = make_payload(0)
+    if app.report_cache is not None:
+        client.post('/download_report', json=payload)
+        download = lambda: client.post('/download_report', json=payload)
+        results['download_report_cached_ms'] = (time_per_call(download, [()] * 50) * 1000, 'ms', 'lower')
+
+
+def bench_validation(results, n=2000):
+    records = [(record,) for record in sample_records(n, seed=3)]
+    results['preprocess_input_us'] = (time_per_call(app.preprocess_input, records) * 1e6, 'us', 'lower')
+    results['validate_record_us'] = (time_per_call(app.validate_record, records) * 1e6, 'us', 'lower')
+
+
+class NoopMetrics(app.Metrics):
+    # Drop-in registry that records nothing, for timing requests without metrics
+    def stage(self, endpoint, stage, start):
+        return time.perf_counter()
+
+    def inc(self, name, amount=1, help='', **labels):
+        pass
+
+
+def bench_metrics(results, n=100000, n_requests=100, rounds=21):
+    # Cost of one per-stage timing call, which every request pays several times
+    registry = app.Metrics()
+    start = time.perf_counter()
+    for _ in range(n):
+        registry.stage('bench', 'stage', start)
+    results['metrics_stage_overhead_us'] = ((time.perf_counter() - start) / n * 1e6, 'us', 'lower')
+
+    # Whole /predict requests with the live registry against one that records nothing
+    client = app.app.test_client()
+    records = [(record,) for record in sample_records(n_requests, seed=5)]
+    post = lambda record: client.post('/predict', json=record)
+    saved = app.metrics
+    per_call = {'off': [], 'on': []}
+    with serving_mode('model'):
+        try:
+            # Alternate short rounds so drift on the host affects both sides alike
+            for _ in range(rounds):
+                for name, registry in [('off', NoopMetrics()), ('on', app.Metrics())]:
+                    app.metrics = registry
+                    per_call[name].append(time_per_call(post, records, repeats=1))
+        finally:
+            app.metrics = saved
+    for name, timings in per_call.items():
+        results[f'predict_single_metrics_{name}_ms'] = (statistics.median(timings) * 1000, 'ms', 'lower')
+
+
+def bench_scripts(results):
+    # Run the offline pipeline end to end in a scratch copy, so the repo's artifacts are untouched
+    with tempfile.TemporaryDirectory() as scratch:
+        os.makedirs(os.path.join(scratch, 'dataset'))
+        os.makedirs(os.path.join(scratch, 'final'))
+        shutil.copy(os.path.join(REPO_ROOT, 'dataset', 'final.csv'), os.path.join(scratch, 'dataset', 'final.csv'))
+        for script in ['preprocess', 'train', 'evaluation']:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-W', 'ignore', os.path.join(REPO_ROOT, 'src', f'{script}.py')],
+                           cwd=scratch, check=True, capture_output=True)
+            results[f'script_{script}_s'] = (time.perf_counter() - start, 's', 'lower')
+
+
+def run_suite(skip_scripts=False):
+    results = {}
+    bench_validation(results)
+    bench_metrics(results)
+    bench_serving(results, 'model')
+    bench_serving(results, 'fallback')
+    bench_attributions(results)
+    bench_reports(results)
+    if not skip_scripts:
+        bench_scripts(results)
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'metrics': {name: {'value': value, 'unit': unit, 'better': better}
+                    for name, (value, unit, better) in results.items()},
+    }
+
+
+def compare(current, baseline, threshold):
+    # Print each metric against the baseline and return the names that regressed
+    regressions = []
+    print(f"{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, metric in current['metrics'].items():
+        base = baseline['metrics'].get(name)
+        if base is None or not base['value']:
+            print(f"{name:<40} {'-':>12} {metric['value']:12.3f} {'new':>8}")
+            continue
+        change = metric['value'] / base['value'] - 1
+        worse = change > threshold if metric['better'] == 'lower' else change < -threshold
+        flag = '  REGRESSION' if worse else ''
+        print(f"{name:<40} {base['value']:12.3f} {metric['value']:12.3f} {change:+8.1%}{flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the CKD serving and training hot paths.")
+    parser.add_argument('--output', default=RESULTS_PATH, help="Where to write the JSON results")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Stored baseline to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Also store these results as the baseline")
+    parser.add_argument('--compare', action='store_true', help="Compare against the baseline and flag regressions")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown before flagging (default 0.2 = 20%%)")
+    parser.add_argument('--skip-scripts', action='store_true', help="Skip the src/ preprocess, train and evaluation runs")
+    args = parser.parse_args()
+
+    results = run_suite(skip_scripts=args.skip_scripts)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {len(results['metrics'])} metrics to {args.output}")
+    if args.save_baseline:
+        shutil.copy(args.output, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions")
+    else:
+        for name, metric in results['metrics'].items():
+            print(f"{name:<40} {metric['value']:12.3f} {metric['unit']}")
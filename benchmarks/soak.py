@@ -0,0 +1,299 @@
+# Open-loop load and soak test: replay synthetic patients against /predict and /download_report
+# Generate rows first, then run from the repository root against a running server:
+#   python src/synthesize.py --rows 1000000 --out dataset/synthetic_large.npy
+#   python -m benchmarks.soak --rate 200 --duration 3600 [--port 5000]
+# or let the driver start one of the bench_async servers:
+#   python -m benchmarks.soak --start asgi-uvicorn --workers 4 --rate 500 --duration 600
+# Requests are sent at a fixed rate whether or not earlier ones have finished, and latency is
+# measured from each request's scheduled send time, so a stalled server shows up as latency
+# instead of as a lower request rate. A share of /predict requests carry invalid input
+# (missing, blank, non-numeric or out-of-range fields) and are expected to get 400; reports
+# re-post recent /predict results, like the browser's download button.
+import argparse                    # For command-line options
+import asyncio                     # For many in-flight requests from one process
+import collections                 # For the recent results replayed as reports
+import json                        # For request bodies and the results file
+import os                          # For the server environment
+import subprocess                  # For starting a server with --start
+import sys                         # For the interpreter path and progress output
+import time                        # For the send schedule and latencies
+from bisect import bisect_left     # For histogram buckets
+
+import numpy as np                 # For the memory-mapped rows and the mix of request kinds
+
+from benchmarks.bench_async import HOST, SERVERS, wait_for_port
+from src.validation import FEATURES, LAB_PRECISION, RANGE_CHECKS, validate_array
+
+# Latency histogram bounds: 100 us to 60 s in steps of about 3%, so percentiles stay accurate
+# over long runs without keeping every sample
+LATENCY_BOUNDS = np.geomspace(1e-4, 60.0, 400).tolist()
+PERCENTILES = [50, 90, 99, 99.9]
+
+# Ways a /predict record is made invalid; every one is rejected with 400
+INVALID_KINDS = ['missing', 'blank', 'non_numeric', 'out_of_range']
+NUMERIC_FEATURES = ['sc', 'hemo', 'al', 'sg', 'pcv', 'rbcc']
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with approximate percentiles"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.total = 0
+
+    def add(self, seconds):
+        self.counts[bisect_left(LATENCY_BOUNDS, seconds)] += 1
+        self.total += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def percentile(self, q):
+        # Upper bound of the bucket holding the q-th percentile, in milliseconds
+        if not self.total:
+            return None
+        rank = q / 100 * self.total
+        seen = 0
+        for bound, count in zip(LATENCY_BOUNDS + [float('inf')], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound * 1000
+        return float('inf')
+
+
+class Window:
+    """Outcome counts and latencies for one reporting interval"""
+
+    def __init__(self):
+        self.sent = 0
+        self.skipped = 0  # Not sent because --max-in-flight requests were already waiting
+        self.outcomes = collections.Counter()  # (endpoint, outcome) -> requests
+        self.latency = collections.defaultdict(LatencyHistogram)  # endpoint -> successes
+
+    def merge(self, other):
+        self.sent += other.sent
+        self.skipped += other.skipped
+        self.outcomes.update(other.outcomes)
+        for endpoint, histogram in other.latency.items():
+            self.latency[endpoint].merge(histogram)
+
+    def summary(self, seconds):
+        # ok: expected success; rejected: invalid input refused with 400 as intended;
+        # error: any other status; timeout: no response within --timeout
+        endpoints = sorted({endpoint for endpoint, _ in self.outcomes})
+        result = {'seconds': seconds, 'sent': self.sent, 'skipped': self.skipped, 'endpoints': {}}
+        for endpoint in endpoints:
+            counts = {outcome: self.outcomes[(endpoint, outcome)] for outcome in ['ok', 'rejected', 'error', 'timeout']}
+            done = sum(counts.values())
+            histogram = self.latency[endpoint]
+            result['endpoints'][endpoint] = {
+                **counts,
+                'throughput_rps': (counts['ok'] + counts['rejected']) / seconds if seconds else 0.0,
+                'error_rate': (counts['error'] + counts['timeout']) / done if done else 0.0,
+                **{f'p{q}_ms': histogram.percentile(q) for q in PERCENTILES},
+            }
+        return result
+
+
+class Connections:
+    """Keep-alive HTTP/1.1 connections, reused when the server leaves them open"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._idle = []
+
+    async def post(self, path, body, timeout):
+        """POST a JSON body; returns (status, response body)"""
+        reader, writer = self._idle.pop() if self._idle else await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write((f'POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n'
+                          f'Content-Length: {len(body)}\r\n\r\n').encode() + body)
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+            lines = head.decode('latin-1').split('\r\n')
+            headers = dict(line.lower().split(': ', 1) for line in lines[1:] if ': ' in line)
+            if 'content-length' in headers:
+                payload = await asyncio.wait_for(reader.readexactly(int(headers['content-length'])), timeout)
+                keep_alive = headers.get('connection') != 'close' and lines[0].startswith('HTTP/1.1')
+            else:
+                payload = await asyncio.wait_for(reader.read(), timeout)
+                keep_alive = False
+        except BaseException:
+            writer.close()
+            raise
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return int(lines[0].split(' ', 2)[1]), payload
+
+
+def load_rows(path):
+    """Memory-map an (N, 8) .npy written by src/synthesize.py, or read a CSV with the feature columns"""
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    import pandas as pd
+    return pd.read_csv(path, usecols=FEATURES)[FEATURES].to_numpy(dtype=float)
+
+
+def record_for(row):
+    # Format a row the way the web form sends it, at lab precision
+    return {name: f'{value:.{decimals}f}' for name, value, decimals in zip(FEATURES, row.tolist(), LAB_PRECISION)}
+
+
+def make_invalid(record, kind, rng):
+    # Break one field of a valid record so that /predict must reject it
+    record = dict(record)
+    if kind == 'missing':
+        del record[FEATURES[rng.integers(len(FEATURES))]]
+    elif kind == 'blank':
+        record[FEATURES[rng.integers(len(FEATURES))]] = ''
+    elif kind == 'non_numeric':
+        record[NUMERIC_FEATURES[rng.integers(len(NUMERIC_FEATURES))]] = 'n/a'
+    else:
+        feature, low, high, _ = RANGE_CHECKS[rng.integers(len(RANGE_CHECKS))]
+        record[feature] = str(high + (high - low))
+    return record
+
+
+async def soak(connections, rows, args):
+    """Send requests at args.rate for args.duration seconds; returns (per-window summaries, overall summary)"""
+    rng = np.random.default_rng(args.seed)
+    interval = 1.0 / args.rate
+    recent_results = collections.deque(maxlen=256)
+    windows, window, total = [], Window(), Window()
+    in_flight = 0
+    checked = {}  # Row chunk -> whether each row passes the server's validation
+
+    def row_is_valid(i):
+        # Rows are validated in chunks as the replay reaches them, with the app's own checks
+        chunk = i // 65536
+        if chunk not in checked:
+            X = np.asarray(rows[chunk * 65536:(chunk + 1) * 65536], dtype=float)
+            X = np.column_stack([np.round(X[:, j], decimals) for j, decimals in enumerate(LAB_PRECISION)])
+            checked[chunk] = ~validate_array(X)[1].astype(bool)
+        return checked[chunk][i % 65536]
+
+    async def one(endpoint, body, expected, scheduled):
+        nonlocal in_flight
+        try:
+            status, payload = await connections.post(f'/{endpoint}', body, args.timeout)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError, IndexError, ValueError):
+            outcome = 'timeout'
+        else:
+            if status == expected == 200:
+                outcome = 'ok'
+                window.latency[endpoint].add(time.perf_counter() - scheduled)
+                if endpoint == 'predict' and args.report_fraction:
+                    recent_results.append(payload)
+            elif status == expected:
+                outcome = 'rejected'
+            else:
+                outcome = 'error'
+        window.outcomes[(endpoint, outcome)] += 1
+        in_flight -= 1
+
+    start = window_start = time.perf_counter()
+    deadline = start + args.duration
+    tasks = set()
+    i = 0
+    while True:
+        scheduled = start + i * interval
+        if scheduled >= deadline:
+            break
+        now = time.perf_counter()
+        if scheduled > now:
+            await asyncio.sleep(scheduled - now)
+
+        # Close the reporting window; requests still in flight are counted in the window they finish in
+        if scheduled - window_start >= args.report_every:
+            windows.append(window.summary(scheduled - window_start))
+            print_window(len(windows), windows[-1], in_flight)
+            total.merge(window)
+            window, window_start = Window(), scheduled
+
+        if in_flight >= args.max_in_flight:
+            window.skipped += 1
+            i += 1
+            continue
+
+        # Pick the request: a report of a recent result, an invalid record, or the next row
+        draw = rng.random()
+        if draw < args.report_fraction and recent_results:
+            endpoint, body, expected = 'download_report', recent_results[rng.integers(len(recent_results))], 200
+        else:
+            record = record_for(rows[i % len(rows)])
+            expected = 200 if row_is_valid(i % len(rows)) else 400
+            if draw > 1 - args.invalid_fraction:
+                record = make_invalid(record, INVALID_KINDS[rng.integers(len(INVALID_KINDS))], rng)
+                expected = 400
+            endpoint, body = 'predict', json.dumps(record).encode()
+        window.sent += 1
+        in_flight += 1
+        task = asyncio.create_task(one(endpoint, body, expected, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        i += 1
+
+    if tasks:
+        await asyncio.wait(tasks, timeout=args.timeout + 1)
+    windows.append(window.summary(time.perf_counter() - window_start))
+    print_window(len(windows), windows[-1], in_flight)
+    total.merge(window)
+    return windows, total.summary(time.perf_counter() - start)
+
+
+def print_window(n, summary, in_flight):
+    for endpoint, r in summary['endpoints'].items():
+        p50 = f"{r['p50_ms']:.1f}" if r['p50_ms'] is not None else '-'
+        p99 = f"{r['p99_ms']:.1f}" if r['p99_ms'] is not None else '-'
+        print(f"[{n:>4}] {endpoint:<16} {r['throughput_rps']:>8.1f} rps  p50 {p50:>7} ms  p99 {p99:>8} ms  "
+              f"errors {r['error_rate']:>6.2%}  rejected {r['rejected']:>6}  in flight {in_flight:>4}  "
+              f"skipped {summary['skipped']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open-loop load and soak test of /predict and /download_report.")
+    parser.add_argument('--rows', default='dataset/synthetic_large.npy', help="Rows from src/synthesize.py (.npy or .csv)")
+    parser.add_argument('--host', default=HOST, help="Server host")
+    parser.add_argument('--port', type=int, default=5000, help="Server port")
+    parser.add_argument('--start', choices=sorted(SERVERS), default=None, help="Start this server on --port first")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes for --start")
+    parser.add_argument('--rate', type=float, default=100.0, help="Requests per second")
+    parser.add_argument('--duration', type=float, default=60.0, help="Seconds to run")
+    parser.add_argument('--invalid-fraction', type=float, default=0.05, help="Share of /predict records made invalid")
+    parser.add_argument('--report-fraction', type=float, default=0.02, help="Share of requests that download a report")
+    parser.add_argument('--max-in-flight', type=int, default=1000, help="Requests waiting at once before sends are skipped")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Per-request timeout; timeouts count as errors")
+    parser.add_argument('--report-every', type=float, default=10.0, help="Seconds per progress line")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the mix of request kinds")
+    parser.add_argument('--output', default=None, help="Also write every window and the overall summary as JSON")
+    args = parser.parse_args()
+
+    rows = load_rows(args.rows)
+    server = None
+    if args.start:
+        server = subprocess.Popen(SERVERS[args.start](args.port, args.workers),
+                                  env=dict(os.environ, PYTHONWARNINGS='ignore'),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_for_port(args.port)
+        time.sleep(1.0)  # Let every worker finish warming up
+    try:
+        print(f"Sending {args.rate:g} req/s for {args.duration:g}s from {len(rows)} rows in {args.rows}", file=sys.stderr)
+        windows, overall = asyncio.run(soak(Connections(args.host, args.port), rows, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print(f"{'endpoint':<16} {'ok':>9} {'rejected':>9} {'errors':>7} {'timeouts':>8} {'rps':>8} "
+          + ' '.join(f"{f'p{q} ms':>9}" for q in PERCENTILES))
+    for endpoint, r in overall['endpoints'].items():
+        print(f"{endpoint:<16} {r['ok']:>9} {r['rejected']:>9} {r['error']:>7} {r['timeout']:>8} "
+              f"{r['throughput_rps']:>8.1f} "
+              + ' '.join(f"{r[f'p{q}_ms']:>9.1f}" if r[f'p{q}_ms'] is not None else f"{'-':>9}" for q in PERCENTILES))
+    print(f"sent {overall['sent']}, skipped {overall['skipped']} (in-flight limit)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'overall': overall, 'windows': windows}, f, indent=2)
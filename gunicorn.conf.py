@@ -0,0 +1,15 @@
+# Gunicorn settings for serving the app: gunicorn -c gunicorn.conf.py app:app
+# Add --preload to import and warm the app once in the master, so every forked
+# worker starts with ReportLab imported and the model pages already mapped.
+
+def when_ready(server):
+    """Warm the preloaded app in the master before workers are forked"""
+    if server.cfg.preload_app:
+        import app
+        app.warm_up()
+
+def post_worker_init(worker):
+    """Without --preload, warm each worker before it accepts requests"""
+    if not worker.cfg.preload_app:
+        import app
+        app.warm_up()
@@ -1,12 +1,29 @@
 # Import necessary libraries
-import pandas as pd                # For data manipulation
+import argparse                    # For command-line options
+import hashlib                     # For keying the cached prediction matrix
+import json                        # For the evaluation report
+import os                          # For cache and report paths
+import time                        # For timing each phase
+from concurrent.futures import ProcessPoolExecutor  # For running folds and resamples on several cores
+import numpy as np                 # For vectorized metrics
 import joblib                      # For loading the saved model
+from scipy.stats import rankdata   # For vectorized ROC AUC
+from sklearn.base import clone     # For refitting the saved model's configuration
+from sklearn.model_selection import StratifiedKFold  # For cross-validation folds
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score  # For evaluation metrics
+from preprocess import load_preprocessed  # For reading the dataset from the preprocessing cache
+from hashing import file_sha256    # For keying the cached prediction matrix
+
+# Metrics reported with confidence intervals, all for CKD (class 1) as the positive class
+METRICS = ['accuracy', 'precision', 'recall', 'specificity', 'f1', 'roc_auc']
+
+# Upper bound on bootstrap indices held in memory at once per worker
+BOOTSTRAP_CHUNK_ELEMENTS = 8_000_000
 
 def evaluate_model(data_path, model_path):
     # Load the dataset from the given CSV file
-    df = pd.read_csv(data_path)
-    
+    df = load_preprocessed(data_path)
+
     # Load the trained model from the specified path
     model = joblib.load(model_path)
 
@@ -28,9 +45,196 @@ def evaluate_model(data_path, model_path):
     print("\nClassification Report:")
     print(classification_report(y, y_pred))
 
+def score_metrics(y_true, y_score, threshold=0.5):
+    """Every metric in METRICS, computed row-wise
+
+    y_true and y_score are (resamples, rows) arrays of labels and CKD probabilities
+    (1-D inputs are treated as a single resample). Returns a dict of arrays with
+    one value per resample; undefined ratios are NaN.
+    """
+    y_true = np.atleast_2d(y_true).astype(bool)
+    y_score = np.atleast_2d(y_score)
+    y_pred = y_score >= threshold
+    tp = (y_true & y_pred).sum(axis=1)
+    tn = (~y_true & ~y_pred).sum(axis=1)
+    fp = (~y_true & y_pred).sum(axis=1)
+    fn = (y_true & ~y_pred).sum(axis=1)
+    positives = tp + fn
+    negatives = tn + fp
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = tp / (tp + fp)
+        recall = tp / positives
+        # Mann-Whitney form of ROC AUC, using tie-averaged ranks of the scores
+        ranks = rankdata(y_score, axis=1)
+        roc_auc = ((ranks * y_true).sum(axis=1) - positives * (positives + 1) / 2) / (positives * negatives)
+        return {
+            'accuracy': (tp + tn) / y_true.shape[1],
+            'precision': precision,
+            'recall': recall,
+            'specificity': tn / negatives,
+            'f1': 2 * precision * recall / (precision + recall),
+            'roc_auc': roc_auc,
+        }
+
+def _fit_fold(model, X, y, train_index, test_index):
+    # Fit a copy of the model on one fold and return its out-of-fold CKD probabilities
+    fold_model = clone(model).set_params(n_jobs=1)
+    fold_model.fit(X.iloc[train_index], y.iloc[train_index])
+    proba = fold_model.predict_proba(X.iloc[test_index])
+    return test_index, proba[:, list(fold_model.classes_).index(1)]
+
+def _bootstrap_chunk(y_true, y_score, seed, n_resamples):
+    # Score n_resamples resamples drawn with replacement, in blocks that fit in memory
+    rng = np.random.default_rng(seed)
+    n = len(y_true)
+    block = max(1, BOOTSTRAP_CHUNK_ELEMENTS // n)
+    results = {metric: [] for metric in METRICS}
+    for start in range(0, n_resamples, block):
+        index = rng.integers(0, n, size=(min(block, n_resamples - start), n))
+        for metric, values in score_metrics(y_true[index], y_score[index]).items():
+            results[metric].append(values)
+    return {metric: np.concatenate(values) for metric, values in results.items()}
+
+def out_of_fold_scores(model, X, y, n_splits, seed, workers, cache_path=None):
+    """Out-of-fold CKD probability for every row, fitted fold by fold in a process pool
+
+    The result is the prediction matrix every metric is computed from. When
+    cache_path is given it is stored there and reused while the data, model
+    configuration, fold count and seed stay the same.
+    """
+    if cache_path and os.path.exists(cache_path):
+        return np.load(cache_path), {}
+
+    folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed).split(X, y)
+    y_score = np.empty(len(y))
+    fold_seconds = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_fit_fold, model, X, y, train_index, test_index)
+                   for train_index, test_index in folds]
+        for i, future in enumerate(futures):
+            test_index, proba = future.result()
+            y_score[test_index] = proba
+            fold_seconds[f'fold_{i}_done_seconds'] = time.perf_counter() - start
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        np.save(cache_path, y_score)
+    return y_score, fold_seconds
+
+def cross_validate(data_path, model_path, report_path=None, n_splits=5, n_bootstrap=1000,
+                   confidence=0.95, seed=42, workers=None, cache_dir='.cache/evaluation'):
+    """Stratified k-fold evaluation with bootstrap confidence intervals
+
+    Refits the saved model's configuration on each fold in parallel to get one
+    out-of-fold prediction per row. Per-fold metrics, point estimates and
+    percentile bootstrap intervals are then all computed from that single
+    prediction matrix, with resamples split across the same pool. Writes a JSON
+    report with every metric and phase timings when report_path is given.
+    """
+    timings = {}
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    df = load_preprocessed(data_path)
+    X = df.drop(['class_encoded', 'class'], axis=1)
+    y = df['class_encoded']
+    model = joblib.load(model_path)
+    timings['load_seconds'] = time.perf_counter() - start
+
+    # One out-of-fold prediction per row, cached by data, model configuration and folds
+    phase = time.perf_counter()
+    key = hashlib.sha256(json.dumps({
+        'data': file_sha256(data_path),
+        'params': {name: repr(value) for name, value in model.get_params().items()},
+        'n_splits': n_splits,
+        'seed': seed,
+    }, sort_keys=True).encode()).hexdigest()
+    cache_path = os.path.join(cache_dir, f'oof_{key[:16]}.npy') if cache_dir else None
+    y_true = y.to_numpy()
+    y_score, fold_seconds = out_of_fold_scores(model, X, y, n_splits, seed, workers, cache_path)
+    timings['cross_validation_seconds'] = time.perf_counter() - phase
+    timings['prediction_matrix_cached'] = not fold_seconds
+
+    # Per-fold metrics from the same matrix
+    folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed).split(X, y)
+    per_fold = [score_metrics(y_true[test_index], y_score[test_index]) for _, test_index in folds]
+
+    # Bootstrap resamples, split evenly across workers with independent seeds
+    phase = time.perf_counter()
+    sizes = [len(part) for part in np.array_split(np.arange(n_bootstrap), workers) if len(part)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks = list(pool.map(_bootstrap_chunk, [y_true] * len(sizes), [y_score] * len(sizes), seeds, sizes))
+    timings['bootstrap_seconds'] = time.perf_counter() - phase
+
+    point = score_metrics(y_true, y_score)
+    alpha = (1 - confidence) / 2
+    metrics = {}
+    for metric in METRICS:
+        samples = np.concatenate([chunk[metric] for chunk in chunks])
+        fold_values = np.array([fold[metric][0] for fold in per_fold])
+        low, high = np.nanquantile(samples, [alpha, 1 - alpha])
+        metrics[metric] = {
+            'estimate': float(point[metric][0]),
+            'ci_low': float(low),
+            'ci_high': float(high),
+            'bootstrap_std': float(np.nanstd(samples)),
+            'fold_mean': float(np.mean(fold_values)),
+            'fold_std': float(np.std(fold_values)),
+            'folds': fold_values.tolist(),
+        }
+    timings['total_seconds'] = time.perf_counter() - start
+    timings.update(fold_seconds)
+
+    report = {
+        'data_path': data_path,
+        'model_path': model_path,
+        'rows': len(y_true),
+        'n_splits': n_splits,
+        'n_bootstrap': n_bootstrap,
+        'confidence': confidence,
+        'seed': seed,
+        'workers': workers,
+        'metrics': metrics,
+        'timings': timings,
+    }
+    if report_path:
+        report_dir = os.path.dirname(report_path)
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print(f"{n_splits}-fold out-of-fold metrics on {len(y_true)} rows, "
+          f"{confidence:.0%} bootstrap CI from {n_bootstrap} resamples:")
+    for metric, values in metrics.items():
+        print(f"  {metric:<12} {values['estimate']:.4f}  [{values['ci_low']:.4f}, {values['ci_high']:.4f}]")
+    print(f"Cross-validation {timings['cross_validation_seconds']:.1f}s"
+          f"{' (cached)' if timings['prediction_matrix_cached'] else ''}, "
+          f"bootstrap {timings['bootstrap_seconds']:.1f}s, total {timings['total_seconds']:.1f}s")
+    return report
+
 # Run the evaluation only if this script is executed directly
 if __name__ == "__main__":
-    evaluate_model(
-        data_path="preprocessed_final_ckd.csv",      # Path to the preprocessed dataset
-        model_path="final/ckd_model.pkl"             # Path to the saved model
-    )
+    parser = argparse.ArgumentParser(description="Evaluate the CKD model.")
+    parser.add_argument('--cv', action='store_true',
+                        help="Stratified k-fold evaluation with bootstrap confidence intervals")
+    parser.add_argument('--folds', type=int, default=5, help="Folds for --cv")
+    parser.add_argument('--bootstrap', type=int, default=1000, help="Bootstrap resamples for --cv")
+    parser.add_argument('--workers', type=int, default=None, help="Processes for --cv (default: all cores)")
+    parser.add_argument('--report', default="final/evaluation_report.json", help="Where --cv writes its report")
+    args = parser.parse_args()
+
+    if args.cv:
+        cross_validate(
+            data_path="preprocessed_final_ckd.csv",  # Path to the preprocessed dataset
+            model_path="final/ckd_model.pkl",        # Model whose configuration is cross-validated
+            report_path=args.report,
+            n_splits=args.folds,
+            n_bootstrap=args.bootstrap,
+            workers=args.workers,
+        )
+    else:
+        evaluate_model(
+            data_path="preprocessed_final_ckd.csv",      # Path to the preprocessed dataset
+            model_path="final/ckd_model.pkl"             # Path to the saved model
+        )
@@ -0,0 +1,68 @@
+# Import necessary libraries
+import time                        # For latency measurements
+import numpy as np                 # For parity checks
+import pandas as pd                # For loading the parity dataset
+import joblib                      # For loading the trained model
+from forest import FlatForest      # Flat-array inference engine
+from hashing import file_sha256    # For fingerprinting the source model file
+
+def export_forest(model_path, artifact_path):
+    # Load the trained model and flatten every tree into contiguous arrays
+    model = joblib.load(model_path)
+    forest = FlatForest.from_sklearn(model, source_sha256=file_sha256(model_path))
+
+    # Save the flat arrays next to the model as a memory-mappable artifact directory
+    forest.save_mmap(artifact_path)
+    print(f"Exported {len(forest.roots)} trees ({len(forest.feature)} nodes) to {artifact_path}")
+    return forest
+
+def _median_latency(fn, repeats):
+    # Median wall time of a callable, in seconds
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def check_forest(model_path, artifact_path, data_path, repeats=50):
+    # Load both engines and the dataset used for the parity check
+    model = joblib.load(model_path)
+    forest = FlatForest.load_mmap(artifact_path)
+    df = pd.read_csv(data_path)
+    X = df.drop(['class_encoded', 'class'], axis=1)[list(model.feature_names_in_)].to_numpy(dtype=float)
+
+    # Parity: batched and single-row probabilities must match predict_proba
+    expected = model.predict_proba(X)
+    batch = forest.predict_proba(X)
+    single = np.vstack([forest.predict_proba(row) for row in X])
+    batch_error = float(np.abs(batch - expected).max())
+    single_error = float(np.abs(single - expected).max())
+    labels_match = bool((forest.predict(X) == model.predict(X)).all())
+    print(f"Parity on {len(X)} rows: max |diff| batch={batch_error:.2e} single={single_error:.2e}, "
+          f"labels match: {labels_match}")
+    if batch_error > 1e-9 or single_error > 1e-9 or not labels_match:
+        raise AssertionError("Flat forest does not match model.predict_proba")
+
+    # Latency: single-row and full-dataset scoring
+    row = X[:1]
+    sk_single = _median_latency(lambda: model.predict_proba(row), repeats)
+    flat_single = _median_latency(lambda: forest.predict_proba(row), repeats)
+    sk_batch = _median_latency(lambda: model.predict_proba(X), max(repeats // 10, 3))
+    flat_batch = _median_latency(lambda: forest.predict_proba(X), max(repeats // 10, 3))
+    print(f"Single row:  sklearn {sk_single * 1e3:.3f} ms, flat {flat_single * 1e3:.3f} ms "
+          f"({sk_single / flat_single:.1f}x)")
+    print(f"{len(X)} rows: sklearn {sk_batch * 1e3:.3f} ms, flat {flat_batch * 1e3:.3f} ms "
+          f"({sk_batch / flat_batch:.1f}x)")
+
+# Export and verify the flat forest if this script is executed directly
+if __name__ == "__main__":
+    export_forest(
+        model_path="final/ckd_model.pkl",             # Path to the trained model
+        artifact_path="final/ckd_forest"              # Directory for the memory-mapped artifact
+    )
+    check_forest(
+        model_path="final/ckd_model.pkl",             # Path to the trained model
+        artifact_path="final/ckd_forest",             # Directory of the exported flat forest
+        data_path="preprocessed_final_ckd.csv"        # Dataset used for the parity check
+    )
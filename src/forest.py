@@ -0,0 +1,299 @@
+# Import necessary libraries
+import json                        # For the memory-mapped artifact manifest
+import os                          # For artifact directories
+import numpy as np                 # For the flat tree arrays and vectorized traversal
+
+# Format tag and version written to memory-mapped artifact manifests
+MMAP_FORMAT = 'ckd-flat-forest'
+MMAP_VERSION = 1
+
+
+class FlatForest:
+    """A tree ensemble flattened into contiguous NumPy arrays
+
+    Every tree of the forest is stored back to back: node i splits on
+    feature[i] at threshold[i] and moves to left[i] or right[i] (global node
+    indices). Leaves point both children at themselves, so walking a fixed
+    number of levels always ends on a leaf. value[i] holds the class
+    probabilities of node i, and roots[t] is the first node of tree t.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes,
+                 feature_names=None, max_depth=None, source_sha256='', children=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.feature_names = feature_names
+        self.n_features_in_ = len(feature_names) if feature_names is not None else int(feature.max()) + 1
+        self.max_depth = int(max_depth) if max_depth is not None else self._compute_max_depth()
+        self.source_sha256 = source_sha256
+
+        # Working layouts for the vectorized walk: native index dtype, children interleaved
+        # as [right, left] so the comparison result picks the next node, and one
+        # contiguous probability column per class for cheap leaf gathers. Arrays that
+        # already have this layout (e.g. memory-mapped ones) are used without copying.
+        self._feature = feature.astype(np.intp, copy=False)
+        if children is None:
+            children = np.stack([right, left], axis=1).astype(np.intp).ravel()
+        self._children = children.astype(np.intp, copy=False)
+        self._is_leaf = left == np.arange(len(left))
+        self._value_columns = np.ascontiguousarray(value.T)
+
+        # Plain-list copies for the single-row walk, and the attribution tables, built on first use
+        self._lists = None
+        self._contribution_table = None
+        self._explain_rows = None
+        self._bias = None
+
+    @classmethod
+    def from_sklearn(cls, model, source_sha256=''):
+        """Flatten a fitted RandomForestClassifier (or other tree ensemble of classifiers)"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            own = np.arange(n) + offset
+
+            # Leaves loop back to themselves so traversal can run a fixed number of steps
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset))
+
+            # Normalize node values to class probabilities, as DecisionTreeClassifier.predict_proba does
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature_names = getattr(model, 'feature_names_in_', None)
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.int32),
+            classes=np.asarray(model.classes_),
+            feature_names=None if feature_names is None else np.asarray(feature_names, dtype=str),
+            max_depth=max_depth,
+            source_sha256=source_sha256,
+        )
+
+    def _compute_max_depth(self):
+        # Longest root-to-leaf path, found by walking every tree level by level
+        depth = 0
+        frontier = self.roots
+        while True:
+            internal = frontier[self.left[frontier] != frontier]
+            if len(internal) == 0:
+                return depth
+            frontier = np.concatenate([self.left[internal], self.right[internal]])
+            depth += 1
+
+    def save_mmap(self, directory):
+        """Save raw .npy arrays plus a JSON manifest that load_mmap() can memory-map
+
+        Arrays are written in the exact layout used for inference, so loading maps
+        them straight from the page cache and worker processes share the pages.
+        """
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            'feature': self._feature.astype(np.int64),
+            'threshold': self.threshold.astype(np.float64),
+            'left': self.left.astype(np.int64),
+            'right': self.right.astype(np.int64),
+            'children': self._children.astype(np.int64),
+            'value_columns': np.ascontiguousarray(self._value_columns, dtype=np.float64),
+            'roots': self.roots.astype(np.int64),
+        }
+        manifest = {
+            'format': MMAP_FORMAT,
+            'version': MMAP_VERSION,
+            'arrays': {},
+            'classes': np.asarray(self.classes_).tolist(),
+            'feature_names': None if self.feature_names is None else [str(name) for name in self.feature_names],
+            'max_depth': self.max_depth,
+            'source_sha256': self.source_sha256,
+        }
+        for name, array in arrays.items():
+            filename = f'{name}.npy'
+            np.save(os.path.join(directory, filename), array)
+            manifest['arrays'][name] = {'file': filename, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+        # Write the manifest last, so a readable manifest means every array is in place
+        tmp_path = os.path.join(directory, 'manifest.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(directory, 'manifest.json'))
+
+    @classmethod
+    def load_mmap(cls, directory):
+        """Memory-map a forest saved with save_mmap()"""
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != MMAP_FORMAT or manifest.get('version') != MMAP_VERSION:
+            raise ValueError(f"Unsupported forest artifact in {directory}")
+
+        arrays = {}
+        for name, info in manifest['arrays'].items():
+            array = np.load(os.path.join(directory, info['file']), mmap_mode='r')
+            if array.dtype.str != info['dtype'] or list(array.shape) != info['shape']:
+                raise ValueError(f"Forest array {name} does not match the manifest")
+            arrays[name] = array
+
+        feature_names = manifest.get('feature_names')
+        return cls(
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            left=arrays['left'],
+            right=arrays['right'],
+            value=arrays['value_columns'].T,
+            roots=arrays['roots'],
+            classes=np.asarray(manifest['classes']),
+            feature_names=None if feature_names is None else np.asarray(feature_names, dtype=str),
+            max_depth=manifest['max_depth'],
+            source_sha256=manifest['source_sha256'],
+            children=arrays['children'],
+        )
+
+    def apply(self, X, compact_every=4):
+        """Return the leaf index reached in every tree, shape (n_samples, n_trees)"""
+        # Trees compare float32 inputs against float64 thresholds, like scikit-learn
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        flat_X = X.ravel()
+
+        # One cursor per (row, tree) pair. Leaves loop back to themselves, so finished
+        # cursors are only dropped every few levels instead of after every step
+        nodes = np.tile(self.roots.astype(np.intp), n_samples)
+        offsets = np.repeat(np.arange(n_samples, dtype=np.intp) * n_features, len(self.roots))
+        active = np.arange(len(nodes))
+        current = nodes.copy()
+        for depth in range(1, self.max_depth + 1):
+            go_left = flat_X[offsets + self._feature[current]] <= self.threshold[current]
+            current = self._children[2 * current + go_left]
+            if depth % compact_every == 0 and depth < self.max_depth:
+                walking = ~self._is_leaf[current]
+                if not walking.all():
+                    nodes[active] = current
+                    active, current, offsets = active[walking], current[walking], offsets[walking]
+                if len(active) == 0:
+                    break
+        nodes[active] = current
+        return nodes.reshape(n_samples, len(self.roots))
+
+    def _leaves_one(self, x):
+        # Walk every tree for a single row; plain lists are much cheaper than NumPy scalar indexing
+        if self._lists is None:
+            self._lists = (self.feature.tolist(), self.threshold.tolist(), self.left.tolist(),
+                           self.right.tolist(), self.roots.tolist())
+        feature, threshold, left, right, roots = self._lists
+        x = [float(v) for v in np.asarray(x, dtype=np.float32)]
+        leaves = []
+        for node in roots:
+            while left[node] != node:
+                node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+            leaves.append(node)
+        return leaves
+
+    def _predict_proba_one(self, x):
+        leaves = self._leaves_one(x)
+        return self._value_columns[:, leaves].sum(axis=1) / len(leaves)
+
+    def predict_proba(self, X, chunk_size=4096):
+        """Average class probabilities over all trees, shape (n_samples, n_classes)"""
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 1:
+            return self._predict_proba_one(X[0])[None, :]
+
+        # Score in chunks so the (rows, trees) node matrix stays small
+        proba = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            for c, column in enumerate(self._value_columns):
+                proba[start:start + chunk_size, c] = column[leaves].sum(axis=1) / len(self.roots)
+        return proba
+
+    def predict(self, X):
+        """Predict class labels"""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def build_attributions(self):
+        """Build the per-node tables explain() reads; does nothing once they exist
+
+        Entry [c, f, i] of the Saabas tree-path table is how much the splits on
+        feature f along the path from the root to node i moved the probability of
+        class c. It is built level by level, each child adding its parent's
+        entries plus its own change in value. Call this at load time so requests
+        never pay for it. It is safe to call concurrently: the table that
+        explain() checks is assigned last, after everything it depends on.
+        """
+        if self._contribution_table is not None:
+            return
+        n_classes = self.value.shape[1]
+        table = np.zeros((n_classes, self.n_features_in_, len(self.left)))
+        frontier = self.roots
+        while True:
+            internal = frontier[self.left[frontier] != frontier]
+            if len(internal) == 0:
+                break
+            split_feature = self._feature[internal]
+            children = [self.left[internal], self.right[internal]]
+            for child in children:
+                table[:, :, child] = table[:, :, internal]
+                table[:, split_feature, child] += (self.value[child] - self.value[internal]).T
+            frontier = np.concatenate(children)
+        self._bias = self.value[self.roots].mean(axis=0)
+
+        # Node-major copy with the node values in front, so a single row needs one gather
+        self._explain_rows = np.ascontiguousarray(
+            np.concatenate([self.value, table.reshape(-1, table.shape[2]).T], axis=1))
+        self._contribution_table = table
+
+    def explain(self, X, chunk_size=4096):
+        """Tree-path (Saabas) feature attributions, from the same walk as predict_proba
+
+        Returns (proba, bias, contributions): proba is predict_proba(X), bias is the
+        forest's average root probability per class (n_classes,), and contributions
+        has shape (n_samples, n_features, n_classes), so that for every row
+        bias + contributions.sum(axis=1) == proba. The per-node tables are built on
+        the first call unless build_attributions() ran at load time; after that a
+        row costs one leaf lookup per tree, like predict_proba.
+        """
+        self.build_attributions()
+        table = self._contribution_table
+        n_classes, n_features, _ = table.shape
+        n_trees = len(self.roots)
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 1:
+            totals = self._explain_rows[self._leaves_one(X[0])].sum(axis=0) / n_trees
+            contributions = totals[n_classes:].reshape(n_classes, n_features).T
+            return totals[None, :n_classes], self._bias, contributions[None, :, :]
+
+        # Score in chunks so the (rows, trees) node matrix stays small
+        proba = np.empty((len(X), n_classes))
+        contributions = np.empty((len(X), n_features, n_classes))
+        for start in range(0, len(X), chunk_size):
+            rows = slice(start, start + chunk_size)
+            leaves = self.apply(X[rows])
+            for c in range(n_classes):
+                proba[rows, c] = self._value_columns[c][leaves].sum(axis=1) / n_trees
+                for f in range(n_features):
+                    contributions[rows, f, c] = table[c, f][leaves].sum(axis=1) / n_trees
+        return proba, self._bias, contributions
@@ -0,0 +1,11 @@
+# File fingerprints shared by the app and the offline scripts
+import hashlib                     # For SHA-256 digests
+
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -1,39 +1,206 @@
 # Import necessary libraries
+import hashlib                               # For fingerprinting inputs and encoder config
+import io                                    # For parsing only the appended part of the input
+import json                                  # For the cache manifest
+import numpy as np                           # For the binary column cache
 import pandas as pd                          # For reading and manipulating CSV data
 from sklearn.preprocessing import LabelEncoder  # For encoding categorical variables
 import joblib                                # For saving/loading Python objects
 import os                                    # For file and directory operations
+from hashing import file_sha256              # For checking the output against the cache
 
-def preprocess(input_csv, output_csv, encoder_path):
-    # Load the dataset from the input CSV file
-    data = pd.read_csv(input_csv)
+# Everything that changes the encoded output besides the input itself; part of the cache key
+ENCODER_CONFIG = {'encoder': 'LabelEncoder', 'exclude': ['class'], 'version': 1}
+CACHE_FORMAT = 'ckd-preprocess-cache'
 
-    # Identify categorical columns (excluding the target column 'class' if present)
-    categorical_cols = data.select_dtypes(include=['object', 'category']).columns.tolist()
-    categorical_cols = [col for col in categorical_cols if col != 'class']  # Optional exclusion of target column
+def encoder_config_sha256():
+    """Hash of ENCODER_CONFIG, stored with cached outputs"""
+    return hashlib.sha256(json.dumps(ENCODER_CONFIG, sort_keys=True).encode()).hexdigest()
 
-    # Initialize a dictionary to store label encoders for each categorical column
-    le_dict = {}
+def _input_digests(path, prefix_bytes):
+    # SHA-256 of the whole file and of its first prefix_bytes bytes, in one pass
+    full, prefix = hashlib.sha256(), hashlib.sha256()
+    seen = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            if seen < prefix_bytes:
+                prefix.update(block[:prefix_bytes - seen])
+            full.update(block)
+            seen += len(block)
+    return full.hexdigest(), prefix.hexdigest()
+
+def _encode(data, categorical_cols, le_dict=None):
+    # Label-encode categorical columns in place, fitting new encoders unless le_dict is given
+    fitted = {}
+    for col in categorical_cols:
+        if le_dict is None:
+            le = LabelEncoder()                          # Create a new LabelEncoder instance
+            data[col] = le.fit_transform(data[col].astype(str))  # Encode the column and update the dataframe
+            fitted[col] = le                             # Store the encoder for future use
+        else:
+            data[col] = le_dict[col].transform(data[col].astype(str))
+    return fitted
+
+def _save_frame(data, path):
+    # Store each column as its own array; missing values in text columns get a mask
+    arrays = {}
+    for col in data.columns:
+        column = data[col]
+        if pd.api.types.is_numeric_dtype(column):
+            arrays[col] = column.to_numpy()
+        else:
+            arrays[col] = column.fillna('').to_numpy(dtype=str)
+            arrays[f'{col}__na'] = column.isna().to_numpy()
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+def _load_frame(path, columns):
+    with np.load(path, allow_pickle=False) as arrays:
+        data = pd.DataFrame({col: arrays[col] for col in columns})
+        for col in columns:
+            if f'{col}__na' in arrays:
+                data[col] = data[col].where(~arrays[f'{col}__na'])
+    return data
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format') == CACHE_FORMAT else None
+
+def _write_manifest(cache_dir, manifest):
+    # Written last and atomically, so a readable manifest always matches the cached files
+    tmp_path = os.path.join(cache_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, 'manifest.json'))
+
+def _append_rows(input_csv, manifest, cache_dir):
+    # Parse and encode only the bytes added since the cached run, reusing the fitted encoders.
+    # Returns (all rows, new rows), or None when the new rows need a full rebuild.
+    with open(input_csv, 'rb') as f:
+        f.seek(manifest['input_bytes'])
+        tail = f.read()
+    new_rows = pd.read_csv(io.BytesIO(tail), header=None, names=manifest['columns'])
+
+    # New text columns or unseen labels would change the fitted encoders
+    categorical_cols = manifest['categorical_cols']
+    text_cols = [col for col in new_rows.select_dtypes(include=['object', 'category']).columns
+                 if col not in ENCODER_CONFIG['exclude']]
+    if not set(text_cols) <= set(categorical_cols):
+        return None
+    le_dict = joblib.load(os.path.join(cache_dir, 'label_encoders.pkl'))
     for col in categorical_cols:
-        le = LabelEncoder()                          # Create a new LabelEncoder instance
-        data[col] = le.fit_transform(data[col].astype(str))  # Encode the column and update the dataframe
-        le_dict[col] = le                            # Store the encoder for future use
+        if not set(new_rows[col].astype(str)) <= set(le_dict[col].classes_):
+            return None
+    _encode(new_rows, categorical_cols, le_dict)
+
+    cached = _load_frame(os.path.join(cache_dir, 'data.npz'), manifest['columns'])
+    return pd.concat([cached, new_rows], ignore_index=True), new_rows
+
+def preprocess(input_csv, output_csv, encoder_path, cache_dir=None):
+    """Label-encode the raw dataset and save the processed data and encoders
+
+    With cache_dir, the encoded columns are also kept in a binary cache keyed by
+    the input's SHA-256 and ENCODER_CONFIG. An unchanged input is skipped. An
+    input that only grew is handled by encoding the appended rows with the cached
+    encoders and appending them to output_csv. Anything else, including unseen
+    category labels, is reprocessed from scratch.
+    """
+    manifest = _read_manifest(cache_dir) if cache_dir else None
+    config_sha = encoder_config_sha256()
+    if manifest is not None and manifest['config_sha256'] != config_sha:
+        manifest = None
+
+    input_bytes = os.path.getsize(input_csv)
+    input_sha, prefix_sha = _input_digests(input_csv, manifest['input_bytes'] if manifest else 0)
+    output_matches = (manifest is not None and os.path.exists(output_csv)
+                      and file_sha256(output_csv) == manifest['output_sha256'])
+
+    # Unchanged input: nothing to do beyond restoring missing outputs
+    if manifest is not None and input_sha == manifest['input_sha256']:
+        if not output_matches:
+            _load_frame(os.path.join(cache_dir, 'data.npz'), manifest['columns']).to_csv(output_csv, index=False)
+            manifest['output_sha256'] = file_sha256(output_csv)
+            _write_manifest(cache_dir, manifest)
+        if not os.path.exists(encoder_path):
+            joblib.dump(joblib.load(os.path.join(cache_dir, 'label_encoders.pkl')), encoder_path)
+        print(f"{input_csv} unchanged ({manifest['rows']} rows); using cached preprocessing")
+        return
+
+    # Appended rows: the cached bytes are an exact prefix of the input and end on a line break
+    appended = None
+    if (manifest is not None and input_bytes > manifest['input_bytes']
+            and prefix_sha == manifest['input_sha256'] and manifest['input_ends_with_newline']):
+        appended = _append_rows(input_csv, manifest, cache_dir)
+
+    if appended is not None:
+        data, new_rows = appended
+        categorical_cols = manifest['categorical_cols']
+        if output_matches:
+            new_rows.to_csv(output_csv, mode='a', header=False, index=False)
+        else:
+            data.to_csv(output_csv, index=False)
+        if not os.path.exists(encoder_path):
+            joblib.dump(joblib.load(os.path.join(cache_dir, 'label_encoders.pkl')), encoder_path)
+        print(f"{input_csv}: encoded {len(new_rows)} appended rows with the cached encoders")
+    else:
+        # Load the dataset from the input CSV file
+        data = pd.read_csv(input_csv)
+
+        # Identify categorical columns (excluding the target column 'class' if present)
+        categorical_cols = data.select_dtypes(include=['object', 'category']).columns.tolist()
+        categorical_cols = [col for col in categorical_cols if col not in ENCODER_CONFIG['exclude']]
+
+        # Fit one label encoder per categorical column
+        le_dict = _encode(data, categorical_cols)
+
+        # Save the processed data to the output CSV file
+        data.to_csv(output_csv, index=False)
+
+        # Ensure the directory for saving encoders exists
+        encoder_dir = os.path.dirname(encoder_path)
+        if encoder_dir:
+            os.makedirs(encoder_dir, exist_ok=True)      # Create directory if it doesn't exist
 
-    # Save the processed data to the output CSV file
-    data.to_csv(output_csv, index=False)
+        # Save the dictionary of label encoders to a file using joblib
+        joblib.dump(le_dict, encoder_path)
 
-    # Ensure the directory for saving encoders exists
-    encoder_dir = os.path.dirname(encoder_path)
-    if encoder_dir:
-        os.makedirs(encoder_dir, exist_ok=True)      # Create directory if it doesn't exist
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        _save_frame(data, os.path.join(cache_dir, 'data.npz'))
+        if appended is None:
+            joblib.dump(le_dict, os.path.join(cache_dir, 'label_encoders.pkl'))
+        with open(input_csv, 'rb') as f:
+            f.seek(input_bytes - 1)
+            ends_with_newline = f.read(1) in (b'\n', b'\r')
+        _write_manifest(cache_dir, {
+            'format': CACHE_FORMAT,
+            'config_sha256': config_sha,
+            'input_sha256': input_sha,
+            'input_bytes': input_bytes,
+            'input_ends_with_newline': ends_with_newline,
+            'rows': len(data),
+            'columns': data.columns.tolist(),
+            'categorical_cols': categorical_cols,
+            'output_sha256': file_sha256(output_csv),
+        })
 
-    # Save the dictionary of label encoders to a file using joblib
-    joblib.dump(le_dict, encoder_path)
+def load_preprocessed(data_path, cache_dir='.cache/preprocess'):
+    """Read the preprocessed dataset, from the binary cache when it matches data_path"""
+    manifest = _read_manifest(cache_dir) if cache_dir else None
+    if manifest is not None and file_sha256(data_path) == manifest['output_sha256']:
+        return _load_frame(os.path.join(cache_dir, 'data.npz'), manifest['columns'])
+    return pd.read_csv(data_path)
 
 # Run the preprocessing function if this script is executed directly
 if __name__ == "__main__":
     preprocess(
         input_csv='dataset/final.csv',               # Path to the raw input dataset
         output_csv='preprocessed_final_ckd.csv',     # Path to save the processed dataset
-        encoder_path='final/label_encoders.pkl'      # Path to save the label encoders
+        encoder_path='final/label_encoders.pkl',     # Path to save the label encoders
+        cache_dir='.cache/preprocess'                # Binary cache of the encoded columns
     )
@@ -0,0 +1,142 @@
+# Import necessary libraries
+import argparse                    # For command-line options
+import os                          # For file paths and CPU count
+import sys                         # For progress output
+import time                        # For throughput reporting
+from concurrent.futures import ProcessPoolExecutor  # For scoring chunks on several cores
+import numpy as np                 # For building result columns
+import pandas as pd                # For chunked CSV reading and writing
+import joblib                      # For loading the trained model
+from forest import FlatForest      # Flat-array inference engine
+from hashing import file_sha256    # For matching the flat forest to the model
+from validation import FEATURES, validate_frame  # Same input rules as the web app
+
+# Model used by each worker process, loaded once by _init_worker
+_model = None
+
+
+def load_scoring_model(model_path, artifact_path=None):
+    # Prefer the flat forest when it was exported from this model, otherwise use the pickle.
+    # Memory-mapped, so every worker process shares one copy of the arrays.
+    if artifact_path and os.path.exists(os.path.join(artifact_path, 'manifest.json')):
+        forest = FlatForest.load_mmap(artifact_path)
+        if forest.source_sha256 == file_sha256(model_path):
+            return forest
+    return joblib.load(model_path)
+
+
+def _init_worker(model_path, artifact_path):
+    global _model
+    _model = load_scoring_model(model_path, artifact_path)
+
+
+def score_chunk(chunk):
+    # Validate a chunk of raw rows and score the valid ones in a single call
+    X, errors = validate_frame(chunk)
+    valid = np.array([error is None for error in errors], dtype=bool)
+
+    probability = np.full(len(chunk), np.nan)
+    prediction = np.full(len(chunk), None, dtype=object)
+    if valid.any():
+        proba = _model.predict_proba(X[valid])
+        labels = _model.classes_[proba.argmax(axis=1)]
+        probability[valid] = proba[:, 1] * 100  # Probability of CKD (class 1)
+        prediction[valid] = np.where(labels == 1, "High Risk", "Low Risk")
+
+    result = chunk.copy()
+    result['prediction'] = prediction
+    result['probability'] = probability
+    result['error'] = errors
+    return result
+
+
+class _ResultWriter:
+    # Appends scored chunks to a CSV or Parquet file
+    def __init__(self, output_path, output_format):
+        self.output_path = output_path
+        self.output_format = output_format
+        self._parquet_writer = None
+        self._wrote_header = False
+        if output_format == 'parquet':
+            # pyarrow is only needed for Parquet output
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+            self._pa, self._pq = pyarrow, pyarrow.parquet
+
+    def write(self, frame):
+        if self.output_format == 'parquet':
+            pa, pq = self._pa, self._pq
+            table = pa.Table.from_pandas(frame.astype({'prediction': 'string', 'error': 'string'}), preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.output_path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.output_path, mode='a' if self._wrote_header else 'w',
+                         header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def score_csv(input_csv, output_path, model_path, artifact_path=None, chunk_size=50000,
+              workers=None, output_format=None):
+    # Work out the output format from the file extension unless given
+    if output_format is None:
+        output_format = 'parquet' if output_path.endswith('.parquet') else 'csv'
+    workers = workers or os.cpu_count() or 1
+
+    # Read the input in chunks; keep at most two chunks per worker in flight to bound memory.
+    # Every cell is read as text, like a form post to /predict, so results never depend on
+    # the column types pandas would guess for each chunk and input values are written back as given
+    reader = pd.read_csv(input_csv, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    writer = _ResultWriter(output_path, output_format)
+    start = time.perf_counter()
+    rows = 0
+    invalid = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, artifact_path)) as pool:
+        pending = []
+        for chunk in reader:
+            pending.append(pool.submit(score_chunk, chunk))
+            while len(pending) >= 2 * workers:
+                rows, invalid = _write_next(pending, writer, rows, invalid, start)
+        while pending:
+            rows, invalid = _write_next(pending, writer, rows, invalid, start)
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows ({invalid} invalid) in {elapsed:.1f}s "
+          f"({rows / elapsed if elapsed else 0:.0f} rows/sec) -> {output_path}", file=sys.stderr)
+    return rows
+
+
+def _write_next(pending, writer, rows, invalid, start):
+    # Write the oldest chunk so output keeps the input row order, then report progress
+    result = pending.pop(0).result()
+    writer.write(result)
+    rows += len(result)
+    invalid += int(result['error'].notna().sum())
+    elapsed = time.perf_counter() - start
+    print(f"{rows} rows scored, {rows / elapsed if elapsed else 0:.0f} rows/sec", file=sys.stderr)
+    return rows, invalid
+
+
+# Run the scorer if this script is executed directly
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV of patient records with the CKD model.")
+    parser.add_argument('input_csv', help=f"CSV with columns {','.join(FEATURES)}")
+    parser.add_argument('output_path', help="Output file (.csv or .parquet)")
+    parser.add_argument('--model-path', default='final/ckd_model.pkl', help="Trained model")
+    parser.add_argument('--artifact-path', default='final/ckd_forest', help="Flat forest directory exported from the model")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="Rows per chunk")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None, help="Output format (default: from extension)")
+    args = parser.parse_args()
+
+    score_csv(args.input_csv, args.output_path, args.model_path, args.artifact_path,
+              args.chunk_size, args.workers, args.format)
@@ -0,0 +1,134 @@
+# Import necessary libraries
+import argparse                    # For command-line options
+import os                          # For output paths
+import time                        # For generation throughput
+import numpy as np                 # For vectorized sampling and .npy output
+import pandas as pd                # For reading the source dataset and writing CSV chunks
+from scipy.special import ndtr, ndtri  # Normal CDF and its inverse, for the Gaussian copula
+from validation import FEATURES, LAB_PRECISION  # Model input columns and the lab's decimal places
+
+# Features with a handful of levels are sampled as steps, never between levels
+MAX_DISCRETE_LEVELS = 10
+
+# Class labels as they appear in dataset/final.csv, indexed by class_encoded
+CLASS_LABELS = ['notckd', 'ckd']
+
+def fit_distributions(data_path):
+    """Learn per-class feature distributions from a dataset shaped like dataset/final.csv
+
+    Each class gets a Gaussian copula: the empirical distribution of every
+    feature (its sorted values) plus the correlation of the features' normal
+    scores. Returns a dict that sample() draws from.
+    """
+    df = pd.read_csv(data_path)
+    classes = []
+    for encoded in range(len(CLASS_LABELS)):
+        X = df.loc[df['class_encoded'] == encoded, FEATURES].to_numpy(dtype=float)
+        n = len(X)
+
+        # Normal scores from tie-averaged ranks, so repeated values share one score
+        scores = np.empty_like(X)
+        for j in range(len(FEATURES)):
+            ranks = pd.Series(X[:, j]).rank(method='average').to_numpy()
+            scores[:, j] = ndtri((ranks - 0.5) / n)
+        correlation = np.corrcoef(scores, rowvar=False)
+        correlation = np.nan_to_num(correlation) + np.eye(len(FEATURES)) * 1e-6  # Constant columns
+        classes.append({
+            'sorted': np.sort(X, axis=0),
+            'cholesky': np.linalg.cholesky(correlation),
+            'discrete': [len(np.unique(X[:, j])) <= MAX_DISCRETE_LEVELS for j in range(len(FEATURES))],
+        })
+    prior = float((df['class_encoded'] == 1).mean())
+    return {'classes': classes, 'ckd_prior': prior, 'source_rows': len(df)}
+
+def _quantiles(fitted, u):
+    # Map uniform draws (rows, features) back through each feature's empirical distribution
+    sorted_values = fitted['sorted']
+    n = len(sorted_values)
+    out = np.empty_like(u)
+    grid = (np.arange(n) + 0.5) / n
+    for j, discrete in enumerate(fitted['discrete']):
+        if discrete:
+            out[:, j] = sorted_values[np.minimum((u[:, j] * n).astype(np.intp), n - 1), j]
+        else:
+            out[:, j] = np.round(np.interp(u[:, j], grid, sorted_values[:, j]), LAB_PRECISION[j])
+    return out
+
+def sample(model, n_rows, rngs):
+    """Draw n_rows synthetic rows; returns (X, class_encoded)
+
+    rngs is a (class, normal) pair of numpy Generators. Draws are consumed
+    sequentially, so generating in chunks gives exactly the same rows as one call.
+    """
+    class_rng, normal_rng = rngs
+    y = (class_rng.random(n_rows) < model['ckd_prior']).astype(np.int8)
+    z = normal_rng.standard_normal((n_rows, len(FEATURES)))
+    X = np.empty((n_rows, len(FEATURES)))
+    for encoded, fitted in enumerate(model['classes']):
+        rows = y == encoded
+        X[rows] = _quantiles(fitted, ndtr(z[rows] @ fitted['cholesky'].T))
+    return X, y
+
+def generate(data_path, output_path, n_rows, seed=0, chunk_rows=1 << 18, dtype='float32'):
+    """Write n_rows synthetic rows to output_path, chunk by chunk
+
+    A .npy output is a memory-mapped (n_rows, 8) feature array in FEATURES
+    order, with the labels next to it in <name>.labels.npy. It can be posted to
+    /predict_batch as-is or mmapped by benchmarks/soak.py. Any other extension
+    is written as CSV in the layout of dataset/final.csv. The same seed gives
+    the same rows whatever chunk_rows is.
+    """
+    start = time.perf_counter()
+    model = fit_distributions(data_path)
+    rngs = tuple(np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(2))
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if output_path.endswith('.npy'):
+        features = np.lib.format.open_memmap(output_path, mode='w+', dtype=dtype, shape=(n_rows, len(FEATURES)))
+        labels = np.lib.format.open_memmap(output_path[:-len('.npy')] + '.labels.npy', mode='w+',
+                                           dtype=np.int8, shape=(n_rows,))
+        for offset in range(0, n_rows, chunk_rows):
+            X, y = sample(model, min(chunk_rows, n_rows - offset), rngs)
+            features[offset:offset + len(X)] = X
+            labels[offset:offset + len(y)] = y
+        features.flush()
+        labels.flush()
+        del features, labels
+    else:
+        columns = FEATURES + ['class', 'class_encoded']
+        with open(output_path, 'w', newline='') as f:
+            f.write(','.join(columns) + '\n')
+            for offset in range(0, n_rows, chunk_rows):
+                X, y = sample(model, min(chunk_rows, n_rows - offset), rngs)
+                chunk = pd.DataFrame(X, columns=FEATURES)
+                for feature, decimals in zip(FEATURES, LAB_PRECISION):
+                    if decimals == 0:
+                        chunk[feature] = chunk[feature].astype(np.int64)
+                chunk['class'] = np.array(CLASS_LABELS)[y]
+                chunk['class_encoded'] = y
+                chunk.to_csv(f, header=False, index=False)
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {n_rows} synthetic rows to {output_path} in {elapsed:.1f}s "
+          f"({n_rows / elapsed:,.0f} rows/sec), learned from {model['source_rows']} rows of {data_path}")
+
+# Generate a synthetic dataset only if this script is executed directly
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic CKD patients from the training data's distributions.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Number of rows to generate")
+    parser.add_argument('--out', default='dataset/synthetic_large.npy', help="Output path: .npy (memory-mapped) or .csv")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--chunk-rows', type=int, default=1 << 18, help="Rows generated and written per step")
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float32', help="Feature dtype for .npy output")
+    args = parser.parse_args()
+
+    generate(
+        data_path='dataset/final.csv',               # Dataset the distributions are learned from
+        output_path=args.out,
+        n_rows=args.rows,
+        seed=args.seed,
+        chunk_rows=args.chunk_rows,
+        dtype=args.dtype,
+    )
@@ -1,36 +1,243 @@
 # Import necessary libraries
-import pandas as pd                                # For data manipulation
+import argparse                                     # For command-line options
+import io                                           # For measuring pickled model size in memory
+import itertools                                    # For the search grid
+import json                                         # For the model selection report
+import time                                         # For inference latency measurements and version names
+from concurrent.futures import ProcessPoolExecutor  # For fitting candidates on several cores
+import numpy as np                                  # For latency statistics
 from sklearn.model_selection import train_test_split  # For splitting data into training and testing sets
 from sklearn.ensemble import RandomForestClassifier   # For building the classification model
+from sklearn.metrics import accuracy_score, recall_score  # For scoring search candidates
 import joblib                                       # For saving the trained model
 import os                                           # For handling file paths and directories
+from forest import FlatForest                      # For exporting the flat-array inference engine
+from hashing import file_sha256                    # For fingerprinting the saved model
+from preprocess import load_preprocessed            # For reading the dataset from the preprocessing cache
 
-def train_model(data_path, model_path):
+# Default search space for --search
+SEARCH_GRID = {
+    'n_estimators': [10, 25, 50, 100, 200],
+    'max_depth': [4, 6, 8, 12, None],
+    'min_samples_leaf': [1, 3],
+}
+
+def load_split(data_path):
     # Load the preprocessed dataset
-    df = pd.read_csv(data_path)
+    df = load_preprocessed(data_path)
 
     # Separate features (X) and target variable (y)
     X = df.drop(['class_encoded', 'class'], axis=1)  # Drop target columns to get feature set
     y = df['class_encoded']                          # Use encoded class labels as target
 
     # Split the data into training and testing sets (80% train, 20% test)
-    X_train, X_test, y_train, y_test = train_test_split(
+    return train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y  # Stratify to maintain class distribution
     )
 
-    # Initialize and train the Random Forest classifier
-    model = RandomForestClassifier(random_state=42)
-    model.fit(X_train, y_train)
-
+def save_model(model, model_path, artifact_path=None):
     # Ensure the directory for saving the model exists
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
 
     # Save the trained model to the specified path
     joblib.dump(model, model_path)
 
+    # Export the flat-array copy of the forest used by the app for fast inference,
+    # as a memory-mappable artifact directory
+    forest = FlatForest.from_sklearn(model, source_sha256=file_sha256(model_path))
+    if artifact_path:
+        forest.save_mmap(artifact_path)
+    return forest
+
+def publish_model(forest, registry_dir, X_holdout, y_holdout):
+    # Add the forest to the app's model registry as a new version with its held-out sample.
+    # The version is written under a hidden name and renamed into place, so the app never
+    # sees a partial version.
+    name = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{forest.source_sha256[:12]}"
+    tmp_path = os.path.join(registry_dir, f'.tmp-{name}')
+    forest.save_mmap(tmp_path)
+    np.savez(os.path.join(tmp_path, 'holdout.npz'),
+             X=np.asarray(X_holdout, dtype=float), y=np.asarray(y_holdout))
+    os.replace(tmp_path, os.path.join(registry_dir, name))
+    print(f"Published model version {name} to {registry_dir}")
+    return name
+
+def train_model(data_path, model_path, artifact_path=None, registry_dir=None):
+    X_train, X_test, y_train, y_test = load_split(data_path)
+
+    # Initialize and train the Random Forest classifier
+    model = RandomForestClassifier(random_state=42)
+    model.fit(X_train, y_train)
+
+    forest = save_model(model, model_path, artifact_path)
+    if registry_dir:
+        publish_model(forest, registry_dir, X_test, y_test)
+
+def _scores(model, X, y):
+    # Accuracy and recall on CKD (class 1)
+    y_pred = model.predict(X)
+    return {'accuracy': float(accuracy_score(y, y_pred)), 'recall': float(recall_score(y, y_pred))}
+
+def _fit_candidate(params, X_fit, y_fit, X_val, y_val):
+    # Fit one candidate on a single core and score it on the validation split
+    model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+    model.fit(X_fit, y_fit)
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return model, {
+        'params': params,
+        **_scores(model, X_val, y_val),
+        'model_bytes': buffer.tell(),
+    }
+
+def _measure_latency(model, X, batch_rows, repeats):
+    # Serving latency of the flat forest the app uses: median single-row time over
+    # every row of X, and median time for one batch of batch_rows rows
+    forest = FlatForest.from_sklearn(model)
+    rows = X.to_numpy(dtype=float)
+    forest.predict_proba(rows[:1])  # Build the single-row lists outside the timed loop
+    single = []
+    for _ in range(repeats):
+        for row in rows:
+            start = time.perf_counter()
+            forest.predict_proba(row)
+            single.append(time.perf_counter() - start)
+    batch = np.resize(rows, (batch_rows, rows.shape[1]))
+    batch_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        forest.predict_proba(batch)
+        batch_times.append(time.perf_counter() - start)
+    forest_bytes = sum(array.nbytes for array in (forest.feature, forest.threshold, forest.left,
+                                                  forest.right, forest.value, forest.roots))
+    return {
+        'single_row_ms': float(np.median(single) * 1e3),
+        'single_row_p95_ms': float(np.percentile(single, 95) * 1e3),
+        f'batch_{batch_rows}_ms': float(np.median(batch_times) * 1e3),
+        'forest_bytes': int(forest_bytes),
+    }
+
+def pareto_frontier(candidates):
+    """Indices of candidates no other candidate beats on accuracy, single-row latency and size"""
+    frontier = []
+    for i, a in enumerate(candidates):
+        dominated = False
+        for b in candidates:
+            no_worse = (b['accuracy'] >= a['accuracy'] and b['single_row_ms'] <= a['single_row_ms']
+                        and b['model_bytes'] <= a['model_bytes'])
+            better = (b['accuracy'] > a['accuracy'] or b['single_row_ms'] < a['single_row_ms']
+                      or b['model_bytes'] < a['model_bytes'])
+            if no_worse and better:
+                dominated = True
+                break
+        if not dominated:
+            frontier.append(i)
+    return sorted(frontier, key=lambda i: candidates[i]['single_row_ms'])
+
+def search_models(data_path, model_path, artifact_path=None, report_path=None,
+                  max_latency_ms=None, max_size_mb=None, grid=None, workers=None,
+                  batch_rows=1000, repeats=3, registry_dir=None):
+    """Fit every grid candidate in parallel and save the most accurate one within budget
+
+    Candidates are fitted across worker processes. Latency is then measured one
+    candidate at a time in this process, so timings are not skewed by fits running
+    on other cores. The budget applies to median single-row latency of the flat
+    forest and to the pickled model size. Ties on accuracy go to higher recall,
+    then lower latency.
+
+    Candidates are fitted on part of the training split and ranked on the rest
+    (the validation split). The test split from load_split() is only used to
+    score the chosen model and as the published holdout, so its accuracy is not
+    inflated by the selection. Writes a JSON report with every candidate and the
+    Pareto frontier when report_path is given, and returns the chosen candidate.
+    """
+    X_train, X_test, y_train, y_test = load_split(data_path)
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=0.25, random_state=42, stratify=y_train  # 60/20/20 overall
+    )
+    grid = grid or SEARCH_GRID
+    names = list(grid)
+    params_list = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+    # Fit in parallel, then measure latency serially
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        fitted = list(pool.map(_fit_candidate, params_list, *[[part] * len(params_list)
+                                                           for part in (X_fit, y_fit, X_val, y_val)]))
+    fit_seconds = time.perf_counter() - start
+    candidates = []
+    for model, result in fitted:
+        result.update(_measure_latency(model, X_val, batch_rows, repeats))
+        candidates.append(result)
+    print(f"Fitted {len(candidates)} candidates in {fit_seconds:.1f}s, "
+          f"measured latency in {time.perf_counter() - start - fit_seconds:.1f}s")
+
+    # Most accurate candidate within the latency and size budget
+    within = [i for i, c in enumerate(candidates)
+              if (max_latency_ms is None or c['single_row_ms'] <= max_latency_ms)
+              and (max_size_mb is None or c['model_bytes'] <= max_size_mb * 1e6)]
+    frontier = pareto_frontier(candidates)
+    report = {
+        'budget': {'max_latency_ms': max_latency_ms, 'max_size_mb': max_size_mb},
+        'train_rows': len(X_fit),
+        'validation_rows': len(X_val),
+        'test_rows': len(X_test),
+        'candidates': candidates,
+        'frontier': [candidates[i] for i in frontier],
+        'selected': None,
+        'test': None,
+    }
+    if within:
+        best = max(within, key=lambda i: (candidates[i]['accuracy'], candidates[i]['recall'],
+                                          -candidates[i]['single_row_ms']))
+        report['selected'] = candidates[best]
+        report['test'] = _scores(fitted[best][0], X_test, y_test)
+
+    if report_path:
+        report_dir = os.path.dirname(report_path)
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print(f"{'n_estimators':>12} {'max_depth':>9} {'min_leaf':>8} {'val acc':>8} {'recall':>6} "
+          f"{'row ms':>7} {'batch ms':>8} {'size KB':>8}")
+    for i in frontier:
+        c = candidates[i]
+        print(f"{c['params']['n_estimators']:>12} {str(c['params']['max_depth']):>9} "
+              f"{c['params']['min_samples_leaf']:>8} {c['accuracy']:>8.3f} {c['recall']:>6.3f} "
+              f"{c['single_row_ms']:>7.3f} {c[f'batch_{batch_rows}_ms']:>8.2f} {c['model_bytes'] / 1e3:>8.0f}"
+              f"{'  <- selected' if report['selected'] is c else ''}")
+
+    if not within:
+        raise ValueError("No candidate fits the latency and size budget; see the frontier above")
+    forest = save_model(fitted[best][0], model_path, artifact_path)
+    if registry_dir:
+        publish_model(forest, registry_dir, X_test, y_test)
+    print(f"Saved {report['selected']['params']} to {model_path} "
+          f"(test accuracy {report['test']['accuracy']:.3f}, recall {report['test']['recall']:.3f})")
+    return report['selected']
+
 # Execute the training function if the script is run directly
 if __name__ == "__main__":
-    train_model(
+    parser = argparse.ArgumentParser(description="Train the CKD model.")
+    parser.add_argument('--search', action='store_true',
+                        help="Search n_estimators/max_depth/min_samples_leaf and keep the most accurate model within budget")
+    parser.add_argument('--max-latency-ms', type=float, default=None, help="Single-row latency budget for --search")
+    parser.add_argument('--max-size-mb', type=float, default=None, help="Pickled model size budget for --search")
+    parser.add_argument('--workers', type=int, default=None, help="Processes for --search (default: all cores)")
+    parser.add_argument('--report', default="final/model_selection.json", help="Where --search writes its report")
+    parser.add_argument('--publish', metavar='REGISTRY_DIR', default=None,
+                        help="Also publish the model as a new version in the app's MODEL_REGISTRY_DIR")
+    args = parser.parse_args()
+
+    paths = dict(
         data_path="preprocessed_final_ckd.csv",       # Path to the input dataset
-        model_path="final/ckd_model.pkl"              # Path to save the trained model
+        model_path="final/ckd_model.pkl",             # Path to save the trained model
+        artifact_path="final/ckd_forest"              # Directory for the memory-mapped artifact
     )
+    if args.search:
+        search_models(**paths, report_path=args.report, max_latency_ms=args.max_latency_ms,
+                      max_size_mb=args.max_size_mb, workers=args.workers, registry_dir=args.publish)
+    else:
+        train_model(**paths, registry_dir=args.publish)
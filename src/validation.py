@@ -0,0 +1,166 @@
+# Import necessary libraries
+import numpy as np                 # For vectorized range checks
+
+# Model input columns, in the order the model expects them
+FEATURES = ['sc', 'hemo', 'al', 'sg', 'pcv', 'rbcc', 'dm', 'htn']
+
+# Decimal places each feature is reported to by the lab, in FEATURES order
+LAB_PRECISION = np.array([2, 1, 0, 3, 1, 2, 0, 0])
+
+# Plausible input ranges: (feature, low, high, error message), checked in this order
+RANGE_CHECKS = [
+    ('sc', 0.1, 20.0, "Serum Creatinine must be between 0.1 and 20.0 mg/dL"),
+    ('hemo', 2.0, 20.0, "Hemoglobin must be between 2.0 and 20.0 g/dL"),
+    ('sg', 1.000, 1.040, "Specific Gravity must be between 1.000 and 1.040"),
+    ('pcv', 10.0, 60.0, "Packed Cell Volume must be between 10 and 60%"),
+    ('rbcc', 1.0, 10.0, "Red Blood Cell Count must be between 1.0 and 10.0 millions/μL"),
+]
+
+# Integer-valued inputs and yes/no flags. Like int() in the app, numbers are
+# truncated but strings must be whole numbers: 1.5 is read as 1, "1.5" is an error.
+INTEGER_FEATURES = ['al']
+INTEGER_PATTERN = r'^\s*[+-]?\d+\s*$'
+FLAG_FEATURES = ['dm', 'htn']
+FLAG_TRUE_VALUES = ['yes', '1', 'true']
+
+
+def check_ranges(X):
+    """Vectorized range checks for an (N, 8) array
+
+    Returns an object array holding the first failing check's message for each
+    row, or None for rows that pass every check.
+    """
+    errors = np.full(len(X), None, dtype=object)
+    for feature, low, high, message in reversed(RANGE_CHECKS):
+        # Later checks are applied first so the earliest failing check wins
+        column = X[:, FEATURES.index(feature)]
+        failed = ~((low <= column) & (column <= high))
+        errors[failed] = message
+    return errors
+
+
+def validate_array(X):
+    """Validate an (N, 8) numeric array in FEATURES order, with no per-row Python objects
+
+    Integer and flag features are truncated like int(), and must be finite. Returns
+    a float64 copy with that truncation applied and an object array of per-row error
+    messages (None for valid rows), using the same messages as validate_frame().
+    """
+    X = np.array(X, dtype=np.float64)
+    errors = np.full(len(X), None, dtype=object)
+    has_error = np.zeros(len(X), dtype=bool)
+    for j, feature in enumerate(FEATURES):
+        if feature in INTEGER_FEATURES or feature in FLAG_FEATURES:
+            unparsable = ~np.isfinite(X[:, j]) & ~has_error
+            errors[unparsable] = f"Invalid input: could not parse {feature}"
+            has_error |= unparsable
+            X[:, j] = np.trunc(X[:, j])
+    range_errors = check_ranges(X)
+    errors[~has_error] = range_errors[~has_error]
+    return X, errors
+
+
+def _python_parse(column, values, parsed, parse):
+    # Text cells the vectorized parse rejected get a second try with the parser /predict
+    # uses (float() or int()), so edge cases like "1_0" or "nan" are treated the same
+    for i in np.flatnonzero(~parsed):
+        value = column.iat[i]
+        if isinstance(value, str):
+            try:
+                values[i] = parse(value)
+                parsed[i] = True
+            except (ValueError, OverflowError):
+                pass
+    return values, parsed
+
+
+def _parse_floats(column):
+    # Returns (values, parsed); numbers are taken as they are, strings follow float()
+    import pandas as pd
+    values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=float)
+    parsed = ~np.isnan(values)
+    if not pd.api.types.is_numeric_dtype(column):
+        values, parsed = _python_parse(column, values, parsed, float)
+    return values, parsed
+
+
+def _parse_flags(column):
+    # Strings follow the yes/1/true rule, numbers are truncated like int()
+    import pandas as pd
+    if not pd.api.types.is_numeric_dtype(column):
+        text = column.astype(str).str.lower()
+        is_text = column.map(lambda value: isinstance(value, str))
+        numbers = pd.to_numeric(column.where(~is_text), errors='coerce')
+        values = np.where(is_text, text.isin(FLAG_TRUE_VALUES).astype(float), np.trunc(numbers))
+    else:
+        values = np.trunc(pd.to_numeric(column, errors='coerce').to_numpy(dtype=float))
+    return values, np.isfinite(values)
+
+
+def _parse_integers(column):
+    # Numbers are truncated like int(); strings must be whole numbers, as int() requires
+    import pandas as pd
+    text_column = not pd.api.types.is_numeric_dtype(column)
+    if text_column:
+        is_text = column.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+        whole = column.astype(str).str.fullmatch(INTEGER_PATTERN).to_numpy(dtype=bool)
+        values = np.trunc(pd.to_numeric(column.where(~is_text | whole), errors='coerce').to_numpy(dtype=float))
+    else:
+        values = np.trunc(pd.to_numeric(column, errors='coerce').to_numpy(dtype=float))
+    parsed = np.isfinite(values)
+    if text_column:
+        values, parsed = _python_parse(column, values, parsed, int)
+    return values, parsed
+
+
+def validate_frame(df):
+    """Parse and validate a DataFrame of raw inputs, one patient per row
+
+    Applies the same rules and messages as the app's single-record validation:
+    missing fields first, then values that cannot be parsed, then range checks.
+    Cells are parsed like JSON values sent to /predict: numbers follow the rules
+    for JSON numbers and strings the rules for strings. Read CSVs with
+    dtype=str (as src/score.py does) so every cell is a string, as in a form
+    post, whatever pandas would guess for the column. Returns an
+    (N, 8) float array in FEATURES order and an object array of per-row error
+    messages (None for valid rows).
+    """
+    n = len(df)
+    X = np.full((n, len(FEATURES)), np.nan)
+    errors = np.full(n, None, dtype=object)
+    has_error = np.zeros(n, dtype=bool)
+
+    def flag(mask, message):
+        # Record message for rows that have no earlier error
+        new = mask & ~has_error
+        errors[new] = message
+        has_error[new] = True
+
+    # Missing fields, in feature order
+    missing = {}
+    for feature in FEATURES:
+        if feature not in df.columns:
+            missing[feature] = np.ones(n, dtype=bool)
+        else:
+            column = df[feature]
+            missing[feature] = column.isna().to_numpy() | (column.astype(str) == '').to_numpy()
+        flag(missing[feature], f'Missing required field: {feature}')
+
+    # Values that cannot be parsed
+    for j, feature in enumerate(FEATURES):
+        if feature not in df.columns:
+            continue
+        column = df[feature]
+        if feature in FLAG_FEATURES:
+            values, parsed = _parse_flags(column)
+        elif feature in INTEGER_FEATURES:
+            values, parsed = _parse_integers(column)
+        else:
+            values, parsed = _parse_floats(column)
+        flag(~parsed & ~missing[feature], f"Invalid input: could not parse {feature}")
+        X[:, j] = values
+
+    # Range checks
+    range_errors = check_ranges(X)
+    errors[~has_error] = range_errors[~has_error]
+    return X, errors
@@ -0,0 +1,51 @@
+# Parity tests: the flat-array forest must score exactly like the pickled scikit-learn model
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from src.forest import FlatForest  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def model():
+    return joblib.load(os.path.join(ROOT, 'final', 'ckd_model.pkl'))
+
+
+@pytest.fixture(scope='module')
+def forest():
+    return FlatForest.load_mmap(os.path.join(ROOT, 'final', 'ckd_forest'))
+
+
+@pytest.fixture(scope='module')
+def X(model):
+    df = pd.read_csv(os.path.join(ROOT, 'preprocessed_final_ckd.csv'))
+    return df[list(model.feature_names_in_)].to_numpy(dtype=float)
+
+
+def test_batch_matches_model(model, forest, X):
+    np.testing.assert_allclose(forest.predict_proba(X), model.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+
+
+def test_single_rows_match_model(model, forest, X):
+    expected = model.predict_proba(X)
+    single = np.vstack([forest.predict_proba(row) for row in X])
+    np.testing.assert_allclose(single, expected, rtol=0, atol=1e-12)
+
+
+def test_explain_adds_up_to_prediction(forest, X):
+    proba, bias, contributions = forest.explain(X)
+    np.testing.assert_allclose(proba, forest.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), proba, rtol=0, atol=1e-9)
+
+    # The single-row path uses a different table layout, so check it too
+    for row, expected in zip(X[:50], contributions[:50]):
+        single_proba, single_bias, single_contributions = forest.explain(row)
+        np.testing.assert_allclose(single_contributions[0], expected, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(single_bias + single_contributions[0].sum(axis=0), single_proba[0], rtol=0, atol=1e-9)
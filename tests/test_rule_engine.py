@@ -0,0 +1,122 @@
+# Parity tests: the vectorized CKDPredictor must match the original per-row rule engine exactly
+import itertools
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+# Frozen copy of the scalar rule engine as it was before vectorization; do not edit
+
+NORMAL_RANGES = {'sc': (0.6, 1.3), 'hemo': (12.0, 17.0), 'sg': (1.010, 1.025), 'pcv': (36.0, 48.0), 'rbcc': (4.2, 5.4)}
+RISK_WEIGHTS = {'sc_high': 0.25, 'hemo_low': 0.20, 'sg_abnormal': 0.15, 'pcv_low': 0.15, 'rbcc_low': 0.10,
+                'albumin_high': 0.20, 'diabetes': 0.15, 'hypertension': 0.10}
+
+
+def scalar_extract_risk_factors(data):
+    risk_factors = []
+    risk_score = 0.0
+    sc = float(data[0])
+    hemo = float(data[1])
+    al = int(data[2])
+    sg = float(data[3])
+    pcv = float(data[4])
+    rbcc = float(data[5])
+    dm = int(data[6])
+    htn = int(data[7])
+    if sc > NORMAL_RANGES['sc'][1]:
+        risk_factors.append("Elevated Serum Creatinine")
+        if sc > 3.0:
+            risk_score += RISK_WEIGHTS['sc_high'] * 2
+        else:
+            risk_score += RISK_WEIGHTS['sc_high']
+    if hemo < NORMAL_RANGES['hemo'][0]:
+        risk_factors.append("Low Hemoglobin (Anemia)")
+        risk_score += RISK_WEIGHTS['hemo_low']
+    if sg < NORMAL_RANGES['sg'][0] or sg > NORMAL_RANGES['sg'][1]:
+        risk_factors.append("Abnormal Urine Specific Gravity")
+        risk_score += RISK_WEIGHTS['sg_abnormal']
+    if pcv < NORMAL_RANGES['pcv'][0]:
+        risk_factors.append("Low Packed Cell Volume")
+        risk_score += RISK_WEIGHTS['pcv_low']
+    if rbcc < NORMAL_RANGES['rbcc'][0]:
+        risk_factors.append("Low Red Blood Cell Count")
+        risk_score += RISK_WEIGHTS['rbcc_low']
+    if al > 0:
+        albumin_levels = ["Trace", "1+", "2+", "3+", "4+", "5+"]
+        if al <= len(albumin_levels):
+            risk_factors.append(f"Proteinuria ({albumin_levels[al-1]})")
+            risk_score += RISK_WEIGHTS['albumin_high'] * (al / 5.0)
+    if dm == 1:
+        risk_factors.append("Diabetes Mellitus")
+        risk_score += RISK_WEIGHTS['diabetes']
+    if htn == 1:
+        risk_factors.append("Hypertension")
+        risk_score += RISK_WEIGHTS['hypertension']
+    return risk_factors, risk_score
+
+
+def scalar_predict_fallback(input_data):
+    risk_factors, risk_score = scalar_extract_risk_factors(input_data[0])
+    probability = min(risk_score * 100 / 1.3, 95)
+    if probability >= 60:
+        prediction = "High Risk"
+        confidence = "High"
+    elif probability >= 30:
+        prediction = "Moderate Risk"
+        confidence = "Medium"
+    else:
+        prediction = "Low Risk"
+        confidence = "Medium"
+    if input_data[0][0] > 4.0:
+        prediction = "High Risk"
+        probability = max(probability, 85)
+        confidence = "High"
+    return prediction, probability, risk_factors, confidence
+
+
+def boundary_rows():
+    # Every combination of values on and either side of each rule threshold
+    return np.array(list(itertools.product(
+        [0.1, 1.29, 1.3, 1.31, 2.99, 3.0, 3.01, 3.99, 4.0, 4.01],  # sc
+        [11.9, 12.0, 12.1],                                     # hemo
+        [1.005, 1.009, 1.010, 1.025, 1.026],                    # sg
+        [35.9, 36.0, 36.1],                                     # pcv
+        [4.19, 4.2, 4.21],                                      # rbcc
+        range(8),                                               # al 0..7
+        [0, 1, 2],                                              # dm
+        [0, 1, 2],                                              # htn
+    )))[:, [0, 1, 5, 2, 3, 4, 6, 7]]  # Reorder to FEATURE_NAMES: sc, hemo, al, sg, pcv, rbcc, dm, htn
+
+
+def random_rows(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        np.round(rng.uniform(0.1, 20.0, n), 2), np.round(rng.uniform(2.0, 20.0, n), 1), rng.integers(0, 8, n),
+        np.round(rng.uniform(1.0, 1.04, n), 3), np.round(rng.uniform(10, 60, n), 1), np.round(rng.uniform(1, 10, n), 2),
+        rng.integers(0, 3, n), rng.integers(0, 3, n),
+    ]).astype(float)
+
+
+@pytest.mark.parametrize('rows', [boundary_rows(), random_rows()], ids=['boundaries', 'random'])
+def test_batch_matches_scalar(rows):
+    predictor = app.CKDPredictor()
+    risk_scores, _ = predictor.score_batch(rows)
+    categories, probabilities, risk_masks = predictor.predict_batch(rows)
+    for i, row in enumerate(rows):
+        prediction, probability, risk_factors, confidence = scalar_predict_fallback([row])
+        assert risk_scores[i] == scalar_extract_risk_factors(row)[1], row
+        assert app.RISK_CATEGORIES[categories[i]] == prediction, row
+        assert probabilities[i] == probability, row
+        assert predictor.risk_factor_names(risk_masks[i], row[2]) == risk_factors, row
+        assert ("High" if categories[i] == app.CATEGORY_HIGH else "Medium") == confidence, row
+
+
+def test_single_row_wrappers_match_scalar():
+    predictor = app.CKDPredictor()
+    for row in boundary_rows()[::97]:
+        assert predictor.extract_risk_factors(row) == scalar_extract_risk_factors(row)
+        assert predictor.predict_fallback(np.array([row])) == scalar_predict_fallback([row])
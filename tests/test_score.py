@@ -0,0 +1,57 @@
+# Offline CSV scoring must give the same rows, values and errors as /predict, whatever the chunk size
+import csv
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+import app  # noqa: E402
+from score import score_csv  # noqa: E402
+
+# Number-like and text cells mixed, so chunks of different sizes would get different guessed column types
+ROWS = [
+    {'sc': '1.2', 'hemo': '15.4', 'al': '1.5', 'sg': '1.020', 'pcv': '44', 'rbcc': '5.2', 'dm': '2', 'htn': '0'},
+    {'sc': '4.1', 'hemo': '9.8', 'al': '3', 'sg': '1.010', 'pcv': '30', 'rbcc': '3.6', 'dm': '1', 'htn': '1'},
+    {'sc': '0.9', 'hemo': '14.0', 'al': 'abc', 'sg': '1.025', 'pcv': '45', 'rbcc': '5.0', 'dm': 'yes', 'htn': 'no'},
+    {'sc': '1.0', 'hemo': '13.5', 'al': '0', 'sg': '1.020', 'pcv': '41', 'rbcc': '4.9', 'dm': '2', 'htn': 'true'},
+    {'sc': 'x', 'hemo': '12.0', 'al': ' 2 ', 'sg': '1.015', 'pcv': '38', 'rbcc': '4.5', 'dm': '0', 'htn': '0'},
+    {'sc': '2.5', 'hemo': '', 'al': '1', 'sg': '1.015', 'pcv': '38', 'rbcc': '4.5', 'dm': '0', 'htn': '0'},
+    {'sc': '1.1', 'hemo': '15.0', 'al': '1_0', 'sg': '1.020', 'pcv': '40', 'rbcc': '5.1', 'dm': 'NA', 'htn': '1'},
+]
+
+
+@pytest.fixture(scope='module')
+def input_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp('score') / 'input.csv'
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(ROWS[0]))
+        writer.writeheader()
+        writer.writerows(ROWS)
+    return path
+
+
+def score(input_csv, tmp_path, chunk_size):
+    output_path = tmp_path / f'scored_{chunk_size}.csv'
+    score_csv(str(input_csv), str(output_path), os.path.join(ROOT, 'final', 'ckd_model.pkl'),
+              os.path.join(ROOT, 'final', 'ckd_forest'), chunk_size=chunk_size, workers=1)
+    return pd.read_csv(output_path, dtype=str, keep_default_na=False)
+
+
+def test_results_do_not_depend_on_chunk_size(input_csv, tmp_path):
+    results = [score(input_csv, tmp_path, chunk_size) for chunk_size in (1, 2, 3, len(ROWS))]
+    for result in results[1:]:
+        pd.testing.assert_frame_equal(result, results[0])
+
+    # Input values are written back exactly as given
+    pd.testing.assert_frame_equal(results[0][list(ROWS[0])], pd.DataFrame(ROWS))
+
+
+def test_errors_match_predict(input_csv, tmp_path):
+    result = score(input_csv, tmp_path, 2)
+    for record, error in zip(ROWS, result['error']):
+        _, expected = app.validate_record(record)
+        assert (error or None) == expected
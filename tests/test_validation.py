@@ -0,0 +1,32 @@
+# Parity tests: src/validation.py must accept, reject and describe records exactly like /predict
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import app  # noqa: E402
+from src.validation import validate_frame  # noqa: E402
+
+VALID = {'sc': '1.2', 'hemo': '15.4', 'al': '1', 'sg': '1.020', 'pcv': '44', 'rbcc': '5.2', 'dm': '0', 'htn': 'yes'}
+
+CHANGES = [
+    {},
+    {'al': '1.5'}, {'al': 1.5}, {'al': 'abc'}, {'al': ' 2 '}, {'al': '+3'}, {'al': '-1'}, {'al': '1e0'},
+    {'al': float('inf')},
+    {'sc': 'abc'}, {'sc': '30'}, {'sc': 2}, {'hemo': 'x'}, {'sg': '1.060'}, {'rbcc': 'nan?'},
+    {'dm': 1}, {'dm': 'TRUE'}, {'htn': 'no'}, {'htn': 'maybe'},
+]
+
+
+@pytest.mark.parametrize('change', CHANGES, ids=repr)
+def test_frame_matches_predict(change):
+    record = {**VALID, **change}
+    row, error = app.validate_record(record)
+    X, errors = validate_frame(pd.DataFrame([record]))
+    assert errors[0] == error
+    if error is None:
+        np.testing.assert_array_equal(X[0], row[0])